@@ -11,6 +11,7 @@ from pathlib import Path
 from typing import Tuple, Optional
 import logging
 import os
+import re
 
 logger = logging.getLogger(__name__)
 
@@ -25,8 +26,15 @@ class AppConfig:
     ffmpeg_path: Path = Path("/usr/bin/ffmpeg")
     ffprobe_path: Path = Path("/usr/bin/ffprobe")
     mkvextract_path: Path = Path("/usr/bin/mkvextract")
+    # str forms of the tool paths, converted once for argv construction
+    ffmpeg_path_s: str = field(init=False, repr=False, compare=False)
+    ffprobe_path_s: str = field(init=False, repr=False, compare=False)
+    mkvextract_path_s: str = field(init=False, repr=False, compare=False)
+    # Upper bound for one ffprobe run, so a stalled NAS read cannot hang the factory
+    ffprobe_timeout_sec: int = 30
 
     # Paths
+    # Keep scratch_dir and archive_dir on the same filesystem: relocation is then a rename, not a full copy.
     scratch_dir: Path = Path("/data/scratch")
     archive_dir: Path = Path("/data/archive")
     base_movies_root: Path = Path("/data/scratch/movies")
@@ -38,6 +46,9 @@ class AppConfig:
 
     # TMDB API
     tmdb_read_access_token: str = field(default_factory=lambda: os.getenv("TMDB_READ_ACCESS_TOKEN", ""))
+    # Search results are cached on disk so retries and rescans don't repeat the HTTPS round-trip
+    tmdb_cache_path: Path = Path(__file__).resolve().parent / "tmdb_cache.db"
+    tmdb_cache_ttl: int = 30 * 86400
 
     # Email Configuration
     email_smtp_host: str = field(default_factory=lambda: os.getenv("EMAIL_SMTP_HOST", "smtp.gmail.com"))
@@ -46,12 +57,25 @@ class AppConfig:
     email_smtp_username: Optional[str] = field(default_factory=lambda: os.getenv("EMAIL_SMTP_USERNAME", None))
     email_smtp_password: Optional[str] = field(default_factory=lambda: os.getenv("EMAIL_SMTP_PASSWORD", None))
     email_recipient: Optional[str] = field(default_factory=lambda: os.getenv("EMAIL_RECIPIENT", None))
+    email_attachment_max_bytes: int = 2 * 1024 * 1024
 
     # Hardware Encoding Configuration
     qsv_device: str = "/dev/dri/renderD128"
     global_quality_default: int = 23
     qsv_preset: str = "medium"
     qsv_denoise_level: int = 15
+    # Limit ffprobe stream analysis to ~1 MB / 1 s (header fields only). Disable for odd containers.
+    fast_probe: bool = True
+
+    # Intel GPU generation of qsv_device (9 = Gen9/9.5, 11 = Ice Lake, 12 = Tiger Lake/Arc, ...)
+    qsv_generation: int = 9
+    # hwupload=extra_hw_frames=dynamic needs jellyfin-ffmpeg's patched hwupload filter; stock FFmpeg
+    # only accepts an integer there. Enable only when ffmpeg_path points at such a build.
+    qsv_dynamic_pool: bool = False
+
+    # Remux fast path: HEVC sources at or below this bitrate (bits/s) are stream-copied instead of re-encoded
+    remux_enabled: bool = True
+    remux_bitrate_threshold: int = 15_000_000
 
     # Character replacement rules for Romanian subtitles
     replace_rules: Tuple[Tuple[str, str], ...] = field(default_factory=lambda: (
@@ -61,12 +85,39 @@ class AppConfig:
         ("ª", "S"), ("ã", "a"), ("þ", "t"), ("Þ", "T"),
     ))
 
+    # Compiled from replace_rules (replace_rules stays the source of truth): multi-character rules
+    # become one regex alternation, applied before the str.translate table of single-character ones
+    replace_table: dict = field(init=False, repr=False, compare=False)
+    replace_multi_map: dict = field(init=False, repr=False, compare=False)
+    replace_multi_re: Optional[re.Pattern] = field(init=False, repr=False, compare=False)
+
     # Valid extensions for files to keep during cleanup
     valid_extensions: frozenset = field(default_factory=lambda: frozenset({'.mp4', '.srt', '.sub', '.ass', '.sup', '.idx'}))
 
+    # Derived string prefixes for cheap per-job root matching (trailing separator avoids sibling-prefix matches)
+    movies_root_prefix: str = field(init=False, repr=False, compare=False)
+    tvseries_root_prefix: str = field(init=False, repr=False, compare=False)
+    _validated: bool = field(default=False, init=False, repr=False, compare=False)
+    _tools_validated: bool = field(default=False, init=False, repr=False, compare=False)
+    _log_dirs_ready: bool = field(default=False, init=False, repr=False, compare=False)
+
     def __post_init__(self):
         object.__setattr__(self, 'log_general_dir', self.log_dir / "general")
         object.__setattr__(self, 'log_ffmpeg_dir', self.log_dir / "ffmpeg")
+        object.__setattr__(self, 'ffmpeg_path_s', os.fspath(self.ffmpeg_path))
+        object.__setattr__(self, 'ffprobe_path_s', os.fspath(self.ffprobe_path))
+        object.__setattr__(self, 'mkvextract_path_s', os.fspath(self.mkvextract_path))
+        object.__setattr__(self, 'movies_root_prefix', os.path.join(str(self.base_movies_root), ""))
+        object.__setattr__(self, 'tvseries_root_prefix', os.path.join(str(self.base_tvseries_root), ""))
+        single = {find: repl for find, repl in self.replace_rules if len(find) == 1}
+        multi = {find: repl for find, repl in self.replace_rules if len(find) > 1}
+        object.__setattr__(self, 'replace_table', str.maketrans(single))
+        object.__setattr__(self, 'replace_multi_map', multi)
+        # Longest first, so an alternation never stops at a shorter rule that prefixes a longer one
+        object.__setattr__(self, 'replace_multi_re', re.compile('|'.join(
+            re.escape(find) for find in sorted(multi, key=len, reverse=True))) if multi else None)
+        # Callers may pass a list/set; cleanup does one membership test per file
+        object.__setattr__(self, 'valid_extensions', frozenset(self.valid_extensions))
 
     def setup_directories(self) -> None:
         self.log_dir.mkdir(parents=True, exist_ok=True)
@@ -74,7 +125,10 @@ class AppConfig:
         self.log_ffmpeg_dir.mkdir(parents=True, exist_ok=True)
 
     def validate(self) -> bool:
-        """Validate all configuration at startup."""
+        """Validate all configuration at startup. A successful result is memoized."""
+        if self._validated:
+            return True
+
         errors = []
 
         if not self.tmdb_read_access_token:
@@ -121,10 +175,14 @@ class AppConfig:
         if not 0 <= self.qsv_denoise_level <= 100:
             errors.append(f"Invalid qsv_denoise_level (must be 0-100): {self.qsv_denoise_level}")
 
+        if self.remux_bitrate_threshold < 0:
+            errors.append(f"Invalid remux_bitrate_threshold (must be >= 0): {self.remux_bitrate_threshold}")
+
         if errors:
             for err in errors:
                 logger.error(f"CONFIG_ERROR: {err}")
             return False
 
+        object.__setattr__(self, '_validated', True)
         logger.info("APP_CONFIG_VALIDATED_SUCCESSFULLY")
         return True
@@ -8,23 +8,33 @@ from pathlib import Path
 import glob
 from typing import Optional
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from models import JobContext, EncodingTier
+from models import JobContext, EncodingTier, VideoStreamInfo
 from file_utils import linux_mv
 from encoding_utils import execute_process
+from logging_utils import get_process_log_file
 from subtitle_utils import process_subtitle
 from exceptions import VideoEncodingError, VRAMExhaustionError, ShutdownRequestedError
 
 logger = logging.getLogger(__name__)
 
 class ProcessingPipeline:
-    """Enterprise OOP Pipeline for media processing."""
+    """
+    Enterprise OOP Pipeline for media processing.
+    ffmpeg launches go through execute_process, which keeps Popen on the posix_spawn path
+    (close_fds=False, no preexec_fn, shell, cwd or start_new_session); keep it that way.
+    """
     def __init__(self, context: JobContext):
         self.context = context
+        # Hyper Encode needs a Gen12+ iGPU (low_power VDENC) and a discrete GPU, i.e. at least two DRM render nodes.
+        self.hyper_encode_available = (
+            context.config.qsv_generation >= 12 and len(glob.glob("/dev/dri/renderD12*")) >= 2
+        )
 
     def run(self) -> Optional[Path]:
         """Executes the conversion pipeline."""
-        logger.info(f"=== PIPELINE STARTED: {self.context.media_item.source_path.name} ===")
+        logger.info("=== PIPELINE STARTED: %s ===", self.context.media_item.source_path.name)
         db = self.context.db
         jid = self.context.job_id
         
@@ -32,7 +42,7 @@ class ProcessingPipeline:
         try:
             final_dir = self.context.media_item.compute_final_directory()
         except ValueError as e:
-            logger.error(f"Cannot compute target path to check for existence: {e}")
+            logger.error("Cannot compute target path to check for existence: %s", e)
             return None
             
         expected_mp4 = f"{self.context.media_item.clean_name()}.mp4"
@@ -41,7 +51,7 @@ class ProcessingPipeline:
         db.set_stage_result(jid, 'p5-check', 'pass')
         self.context.db.update_job_stage(jid, "EXISTENCE_CHECK")
         if check_path.exists():
-            logger.warning(f"TARGET_EXISTS: {check_path.name}. Skipping conversion.")
+            logger.warning("TARGET_EXISTS: %s. Skipping conversion.", check_path.name)
             db.set_stage_result(jid, 'p5-fail', 'pass')   # fast-fail branch taken = pass outcome
             self.context.db.update_job_stage(jid, "FAST_FAIL")
             # Clean up associated subtitles to prevent orphans using glob
@@ -60,20 +70,31 @@ class ProcessingPipeline:
         
         db.set_stage_result(jid, 'p5-pass', 'pass')  # mp4 did not exist, proceeding
         
-        # --- PHASE 1: Subtitle Extraction ---
-        subtitle_path = self._extract_subtitles()
-        
-        # 2. Encode Video
-        encoded_file = self._encode_video_with_heuristics()
+        # --- PHASE 1 + 2: Subtitle Extraction (I/O) runs alongside Video Encoding (GPU) ---
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="subtitles") as executor:
+            sub_future = executor.submit(self._extract_subtitles_in_worker)
+            encoded_file = self._encode_video_with_heuristics()
+            try:
+                subtitle_path = sub_future.result()
+            except Exception as e:
+                logger.warning("Subtitle extraction task failed: %s", e, exc_info=True)
+                subtitle_path = None
         
         # 3. Relocate
         final_dir = self._relocate(encoded_file, subtitle_path)
         if not final_dir:
             return None
             
-        logger.info(f"=== PIPELINE SUCCESS: {final_dir} ===")
+        logger.info("=== PIPELINE SUCCESS: %s ===", final_dir)
         return final_dir
 
+    def _extract_subtitles_in_worker(self) -> Optional[Path]:
+        """Run _extract_subtitles on the pool thread, then close the db connection that thread opened."""
+        try:
+            return self._extract_subtitles()
+        finally:
+            self.context.db.close()
+
     def _extract_subtitles(self) -> Path:
         """Handles subtitle extraction and standardization."""
         logger.info("-- PHASE: Subtitle Extraction --")
@@ -96,7 +117,7 @@ class ProcessingPipeline:
                 self.context.db.update_job_stage(jid, "SUBTITLE_NONE")
                 return None
                 
-            logger.info(f"Subtitle processed: {sub.name}")
+            logger.info("Subtitle processed: %s", sub.name)
             # Determine which branch was used from the file extension
             ext = sub.suffix.lower()
             if ext in ('.sub', '.idx'):
@@ -108,7 +129,7 @@ class ProcessingPipeline:
             self.context.db.update_job_stage(jid, "SUBTITLE_DONE")
             return sub
         except Exception as e:
-            logger.warning(f"Subtitle processing failed: {e}", exc_info=True)
+            logger.warning("Subtitle processing failed: %s", e, exc_info=True)
             db.set_stage_result(jid, 'p6-vobsub', 'fail')
             db.set_stage_result(jid, 'p6-text', 'fail')
             return None
@@ -121,17 +142,27 @@ class ProcessingPipeline:
         logger.info("-- PHASE: Video Encoding --")
         db = self.context.db
         jid = self.context.job_id
+        s_info = self.context.media_item.stream_info
+        temp_output = self.context.media_item.source_path.with_name(f"{self.context.media_item.clean_name()}_temp.mp4")
+        ffmpeg_log_path = self.context.ffmpeg_log_path or get_process_log_file(self.context.config, self.context.media_item.clean_name())
+
+        if self._can_remux(s_info):
+            remuxed = self._remux_only(temp_output, ffmpeg_log_path)
+            if remuxed:
+                return remuxed
+
         db.set_stage_result(jid, 'p7-heuristics', 'pass')
         self.context.db.update_job_stage(jid, "HEURISTICS_CHECK")
-        # Define base tiers
+        # Define base tiers (Gen11+ media engines sustain a deeper async queue than Gen9.5)
+        top_async = 8 if self.context.config.qsv_generation >= 11 else 6
         tiers = [
-            EncodingTier(bf=7, lad=40, async_depth=8, desc="Max Quality (High VRAM)"),
-            EncodingTier(bf=4, lad=20, async_depth=4, desc="Balanced (Start Here)"),
+            EncodingTier(bf=7, lad=40, async_depth=top_async, desc="Max Quality (High VRAM)"),
+            EncodingTier(bf=4, lad=20, async_depth=top_async, desc="Balanced (Start Here)"),
             EncodingTier(bf=0, lad=10, async_depth=2, desc="Safe Mode (Low VRAM)")
         ]
+        hyper_tier = EncodingTier(bf=0, lad=0, async_depth=60, desc="HyperEncode (Dual GPU)", hyper=True)
 
         # Filter by heuristic if previously defined
-        s_info = self.context.media_item.stream_info
         best_profile = None
         if s_info:
             best_profile = self.context.db.get_best_profile(
@@ -140,7 +171,7 @@ class ProcessingPipeline:
             
         if best_profile:
             best_bf, best_lad, best_async = best_profile
-            logger.info(f"Loaded heuristics from DB: {best_bf}bf, {best_lad}lad")
+            logger.info("Loaded heuristics from DB: %sbf, %slad", best_bf, best_lad)
             # Filter out tiers strictly more aggressive than the known best
             valid_tiers = [t for t in tiers if t.bf <= best_bf and t.lad <= best_lad]
             
@@ -150,7 +181,9 @@ class ProcessingPipeline:
                  # If heuristics map to something weirder than tiers, inject it as top tier
                  tiers.insert(0, EncodingTier(bf=best_bf, lad=best_lad, async_depth=best_async, desc="Heuristic Model"))
 
-        temp_output = self.context.media_item.source_path.with_name(f"{self.context.media_item.clean_name()}_temp.mp4")
+        if self.hyper_encode_available:
+            logger.info("Dual render nodes detected. Prepending HyperEncode tier.")
+            tiers.insert(0, hyper_tier)
 
         for attempt in tiers:
             if self.context.shutdown_event and self.context.shutdown_event.is_set():
@@ -160,29 +193,25 @@ class ProcessingPipeline:
             _tier_stage = "ENCODING_TIER_HEURISTIC" if "Heuristic" in attempt.desc else f"ENCODING_TIER_{attempt.desc.split()[0].upper()}"
             self.context.db.update_job_stage(jid, _tier_stage)
             db.set_stage_result(jid, 'p7-tiers', 'pass')  # mark tiers card active
-            logger.info(f"ATTEMPT: {attempt.desc} -> bf={attempt.bf}, lad={attempt.lad}")
+            logger.info("ATTEMPT: %s -> bf=%s, lad=%s", attempt.desc, attempt.bf, attempt.lad)
             
-            builder = self.context.strategy.build_command(
-                self.context.media_item, temp_output, 
-                bf=attempt.bf, lad=attempt.lad, async_depth=attempt.async_depth
-            )
-            
-            cmd = builder.build()
+            cmd = self.context.strategy.build_command(
+                self.context.media_item, temp_output,
+                bf=attempt.bf, lad=attempt.lad, async_depth=attempt.async_depth, hyper=attempt.hyper
+            ).build()
             
             try:
-                proc = execute_process(cmd, wait_for_completion=True, config=self.context.config, log_name=self.context.media_item.clean_name())
+                log_offset = ffmpeg_log_path.stat().st_size if ffmpeg_log_path.exists() else 0
+                proc = execute_process(cmd, wait_for_completion=True, config=self.context.config, log_path=ffmpeg_log_path)
                 if proc is None:
-                    # Check recent log for memory strings
+                    # Check this attempt's section of the job log for memory strings
                     is_vram = False
-                    if self.context.config.log_ffmpeg_dir.exists():
-                        safe_log_name = glob.escape(self.context.media_item.clean_name())
-                        candidates = list(self.context.config.log_ffmpeg_dir.glob(f"*{safe_log_name}*.log"))
-                        if candidates:
-                            newest_log = max(candidates, key=lambda p: p.stat().st_mtime)
-                            with open(newest_log, 'r', errors='ignore') as f:
-                                content = f.read().lower()
-                                if any(x in content for x in ["mfx_err_memory_alloc", "mfxerr_memory_alloc", "not enough surfaces", "out of memory", "allocation failed", "cannot allocate memory"]):
-                                    is_vram = True
+                    if ffmpeg_log_path.exists():
+                        with open(ffmpeg_log_path, 'rb') as f:
+                            f.seek(log_offset)
+                            content = f.read().decode('utf-8', errors='ignore').lower()
+                            if any(x in content for x in ["mfx_err_memory_alloc", "mfxerr_memory_alloc", "not enough surfaces", "out of memory", "allocation failed", "cannot allocate memory", "dual_gfx"]):
+                                is_vram = True
                                     
                     if is_vram:
                         raise VRAMExhaustionError("Process returned None (Likely VRAM crash)")
@@ -193,14 +222,14 @@ class ProcessingPipeline:
                 if not temp_output.exists() or temp_output.stat().st_size < 1000:
                      raise VideoEncodingError("Output file missing or empty")
                      
-                logger.info(f"Encoding successful on tier: {attempt.desc}")
+                logger.info("Encoding successful on tier: %s", attempt.desc)
                 db.set_stage_result(jid, 'p7-audio', 'pass')   # audio converted as part of encode
                 db.set_stage_result(jid, 'p7-tiers', 'pass')
                 db.set_stage_result(jid, 'p7-outcome', 'pass')
                 self.context.db.update_job_stage(jid, "ENCODING_SUCCESS")
                 
-                # Save success heuristics cleanly
-                if s_info:
+                # Save success heuristics cleanly (HyperEncode depends on the host, not the media)
+                if s_info and not attempt.hyper:
                     self.context.db.save_successful_profile(
                         s_info.width, s_info.height, s_info.codec_name, s_info.pix_fmt,
                         attempt.bf, attempt.lad, attempt.async_depth
@@ -208,7 +237,7 @@ class ProcessingPipeline:
                 return temp_output
 
             except (VRAMExhaustionError, VideoEncodingError) as e:
-                logger.warning(f"Hardware limits exceeded: {e}. Stepping down.")
+                logger.warning("Hardware limits exceeded: %s. Stepping down.", e)
                 if temp_output.exists():
                      temp_output.unlink(missing_ok=True)
                 if self.context.shutdown_event:
@@ -217,7 +246,7 @@ class ProcessingPipeline:
                     threading.Event().wait(2)  # Cooldown HW
                 continue
             except Exception as e:
-                logger.exception(f"Encoding failed: {e}")
+                logger.exception("Encoding failed: %s", e)
                 db.set_stage_result(jid, 'p7-audio', 'fail')
                 db.set_stage_result(jid, 'p7-tiers', 'fail')
                 db.set_stage_result(jid, 'p7-outcome', 'fail')
@@ -231,6 +260,40 @@ class ProcessingPipeline:
         db.set_stage_result(jid, 'p7-outcome', 'fail')
         raise VideoEncodingError("All encoding memory tiers failed.")
 
+    def _can_remux(self, s_info: Optional[VideoStreamInfo]) -> bool:
+        """True when the source is already 1080p-or-smaller 4:2:0 HEVC within the remux bitrate budget."""
+        config = self.context.config
+        if not config.remux_enabled or not s_info or s_info.codec_name != "hevc":
+            return False
+        if not 0 < s_info.bit_rate <= config.remux_bitrate_threshold:
+            return False
+        if s_info.width > 1920 or s_info.height > 1080:
+            return False
+        return "422" not in s_info.pix_fmt and "444" not in s_info.pix_fmt
+
+    def _remux_only(self, temp_output: Path, ffmpeg_log_path: Path) -> Optional[Path]:
+        """Stream-copies the HEVC video into MP4. Returns None so the caller falls back to a full encode."""
+        db = self.context.db
+        jid = self.context.job_id
+        s_info = self.context.media_item.stream_info
+        logger.info("REMUX_FAST_PATH: source is HEVC at %s bit/s. Skipping re-encode.", s_info.bit_rate)
+        self.context.db.update_job_stage(jid, "REMUX")
+
+        cmd = self.context.strategy.build_remux_command(self.context.media_item, temp_output).build()
+        proc = execute_process(cmd, wait_for_completion=True, config=self.context.config, log_path=ffmpeg_log_path)
+        if proc is None or not temp_output.exists() or temp_output.stat().st_size < 1000:
+            logger.warning("Remux failed. Falling back to hardware encode.")
+            temp_output.unlink(missing_ok=True)
+            return None
+
+        logger.info("Remux successful.")
+        db.set_stage_result(jid, 'p7-heuristics', 'skip')
+        db.set_stage_result(jid, 'p7-tiers', 'skip')
+        db.set_stage_result(jid, 'p7-audio', 'pass')
+        db.set_stage_result(jid, 'p7-outcome', 'pass')
+        self.context.db.update_job_stage(jid, "ENCODING_SUCCESS")
+        return temp_output
+
     def _relocate(self, encoded_file: Path, subtitle_file: Path) -> Path:
         """Moves fully processed artifacts exactly into their target Domain structure."""
         logger.info("-- PHASE: Relocation --")
@@ -242,7 +305,7 @@ class ProcessingPipeline:
             final_dir = self.context.media_item.compute_final_directory()
             final_dir.mkdir(parents=True, exist_ok=True)
         except ValueError as e:
-            logger.error(f"Path resolution error during relocation: {e}")
+            logger.error("Path resolution error during relocation: %s", e)
             db.set_stage_result(jid, 'p8-relocate', 'fail')
             raise ValueError(f"Relocation failed (outside specific base root): {e}")
         
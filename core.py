@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 import logging
+import stat
 import time
-import glob
 from pathlib import Path
 from config import AppConfig
 from db_utils import DatabaseManager
@@ -24,8 +24,8 @@ def queue_worker_loop(config: AppConfig, shutdown_event: threading.Event, poll_i
 
     logger.info("="*80)
     logger.info("ENTERPRISE QUEUE WORKER STARTED")
-    logger.info(f"SQLite DB: {db.db_path}")
-    logger.info(f"Poll_interval: {poll_interval}s")
+    logger.info("SQLite DB: %s", db.db_path)
+    logger.info("Poll_interval: %ss", poll_interval)
     logger.info("="*80)
     logger.info("="*80)
     
@@ -59,7 +59,7 @@ def queue_worker_loop(config: AppConfig, shutdown_event: threading.Event, poll_i
                 db.set_stage_result(job_id, 'p1-input', 'pass')
                 db.set_stage_result(job_id, 'p1-queue', 'pass')
                 db.set_stage_result(job_id, 'p2-dequeue', 'pass')
-                logger.info(f"DEQUEUED_JOB [{job_id}]: {job_path_str}")
+                logger.info("DEQUEUED_JOB [%s]: %s", job_id, job_path_str)
                 job_path = Path(job_path_str)
 
                 # ===== SAFEGUARD: REJECT SEEDING PATHS =====
@@ -78,20 +78,20 @@ def queue_worker_loop(config: AppConfig, shutdown_event: threading.Event, poll_i
                 db.update_job_stage(job_id, "MEDIA_TYPE_ROUTER")
                 db.set_stage_result(job_id, 'p3-router', 'pass')
                 job_path_abs = job_path.absolute()
-                media_type = MediaType.UNKNOWN
-                
-                if job_path_abs.is_relative_to(config.base_movies_root):
-                    media_type = MediaType.MOVIE
-                elif job_path_abs.is_relative_to(config.base_tvseries_root):
-                    media_type = MediaType.TVSERIES
+                media_type = MediaFactory.classify(job_path_abs, config)
+                # One stat for the whole routing + factory path (directory check, is_file, probe cache key)
+                try:
+                    job_stat = job_path_abs.stat()
+                except OSError:
+                    job_stat = None
                     
-                if job_path_abs.is_dir():
+                if job_stat is not None and stat.S_ISDIR(job_stat.st_mode):
                     if media_type == MediaType.TVSERIES:
                         process_tv_series_directory(job_path_abs, config, db)
                     elif media_type == MediaType.MOVIE:
                         actual_file = get_largest_movie_file(job_path_abs)
                         if actual_file:
-                            db.add_job(str(actual_file.absolute()))
+                            db.add_job(str(actual_file))
                     
                     db.update_job_status(job_id, JobStatus.COMPLETED.value)
                     db.update_job_stage(job_id, "DIRECTORY_EXPANDED")
@@ -99,18 +99,18 @@ def queue_worker_loop(config: AppConfig, shutdown_event: threading.Event, poll_i
                     
                 # Instantiate MediaItem Domain Models via Factory
                 try:
-                    media_items = MediaFactory.create(media_type, job_path, config)
+                    media_items = MediaFactory.create(media_type, job_path_abs, config, stat_result=job_stat, db=db)
                 except MediaValidationError as e:
-                    logger.error(f"Media validation error for {job_path}: {e}")
+                    logger.error("Media validation error for %s: %s", job_path, e)
                     db.update_job_status(job_id, JobStatus.REJECTED.value)
                     continue
                 except ValueError as e:
-                    logger.warning(f"Skipping invalid media file {job_path}: {e}")
+                    logger.warning("Skipping invalid media file %s: %s", job_path, e)
                     db.update_job_status(job_id, JobStatus.REJECTED.value)
                     continue
                      
                 if not media_items:
-                     logger.error(f"Failed to resolve domain model for {job_path}")
+                     logger.error("Failed to resolve domain model for %s", job_path)
                      db.update_job_status(job_id, JobStatus.REJECTED.value)
                      continue
 
@@ -129,28 +129,29 @@ def queue_worker_loop(config: AppConfig, shutdown_event: threading.Event, poll_i
                     log_name = media_item.clean_name()
                     
                     general_log_path = None
+                    ffmpeg_log_path = None
                     try:
                         # Start per-job logging
-                        general_log_path = start_job_logging(config, log_name)
+                        general_log_path, ffmpeg_log_path = start_job_logging(config, log_name)
                         
                         # Assemble Context, Strategy and Pipeline
                         strategy = IntelQSVStrategy(config)
-                        context = JobContext(config=config, db=db, media_item=media_item, strategy=strategy, job_id=job_id, shutdown_event=shutdown_event)
+                        context = JobContext(config=config, db=db, media_item=media_item, strategy=strategy, job_id=job_id, shutdown_event=shutdown_event, ffmpeg_log_path=ffmpeg_log_path)
                         pipeline = ProcessingPipeline(context)
                         
                         # Execute
                         result = pipeline.run()
                         if not result:
-                            logger.error(f"Pipeline returned False/failed for {media_item.source_path}, moving on.")
+                            logger.error("Pipeline returned False/failed for %s, moving on.", media_item.source_path)
                             all_successful = False
                             failed_items.append(media_item.source_path.name)
                                 
                     except ShutdownRequestedError:
-                        logger.info(f"JOB_SUSPENDED: {media_item.source_path} will be automatically requeued on next boot.")
+                        logger.info("JOB_SUSPENDED: %s will be automatically requeued on next boot.", media_item.source_path)
                         shutdown_requested = True
                         break
                     except Exception as e:
-                        logger.exception(f"ERROR_in_job_processing: {e}")
+                        logger.exception("ERROR_in_job_processing: %s", e)
                         all_successful = False
                         failed_items.append(media_item.source_path.name)
                         
@@ -160,12 +161,8 @@ def queue_worker_loop(config: AppConfig, shutdown_event: threading.Event, poll_i
                             if general_log_path and general_log_path.exists():
                                 attachments.append(general_log_path)
                             
-                            if config.log_ffmpeg_dir.exists():
-                                safe_log_name = glob.escape(log_name)
-                                candidates = list(config.log_ffmpeg_dir.glob(f"*{safe_log_name}*.log"))
-                                if candidates:
-                                    newest_ffmpeg_log = max(candidates, key=lambda p: p.stat().st_mtime)
-                                    attachments.append(newest_ffmpeg_log)
+                            if ffmpeg_log_path and ffmpeg_log_path.exists():
+                                attachments.append(ffmpeg_log_path)
                             
                             send_failure_email(
                                 config=config,
@@ -174,13 +171,13 @@ def queue_worker_loop(config: AppConfig, shutdown_event: threading.Event, poll_i
                                 attachment_paths=attachments
                             )
                         except Exception as email_err:
-                            logger.exception(f"Failed to send failure email: {email_err}")
+                            logger.exception("Failed to send failure email: %s", email_err)
                     finally:
                         # Restore logging to main file
                         restore_main_logging()
 
                 if not all_successful and not shutdown_requested and failed_items:
-                    logger.warning(f"Job completed with partial failures. Failed items: {failed_items}")
+                    logger.warning("Job completed with partial failures. Failed items: %s", failed_items)
 
                 if shutdown_requested:
                     db.update_job_status(job_id, JobStatus.PENDING.value)
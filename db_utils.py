@@ -4,25 +4,36 @@ SQLite Database Manager for Job Queue and Encoding Heuristics.
 
 import sqlite3
 import logging
+from dataclasses import fields
 from pathlib import Path
-from typing import Optional, Tuple
-from threading import Lock
+from typing import List, Optional, Tuple
+from threading import Lock, local
 import fcntl
 from contextlib import closing
-from models import JobStatus
+from models import JobStatus, VideoStreamInfo
 
 logger = logging.getLogger(__name__)
 
+# Bumped whenever tables or indexes change; stored in PRAGMA user_version.
+SCHEMA_VERSION = 2
+
+# stream_info_cache columns after the (path, mtime_ns, size) key, named after VideoStreamInfo's fields.
+# A new field needs a matching column and a SCHEMA_VERSION bump, which recreates the table.
+_STREAM_INFO_COLUMNS = tuple(f.name for f in fields(VideoStreamInfo))
+
 class DatabaseManager:
     def __init__(self, db_path: Path):
         self.db_path = db_path
         self._lock = Lock()
+        self._local = local()
         self._init_db()
 
     def _init_db(self):
         """Initialize SQLite tables for jobs and encoding profiles."""
-        with closing(self._get_connection()) as conn:
-            with conn:
+        # UPDATE ... RETURNING requires SQLite 3.35+
+        self._supports_returning = sqlite3.sqlite_version_info >= (3, 35, 0)
+        with self._lock:
+            with self._get_connection() as conn:
                 with closing(conn.cursor()) as cursor:
                 
                     # Job Queue Table
@@ -65,17 +76,61 @@ class DatabaseManager:
                             UNIQUE(width, height, codec, pix_fmt)
                         )
                     """)
+
+                    # Probe results, valid while the file's mtime and size are unchanged.
+                    # It is only a cache, so a table written under an older schema is dropped and refilled.
+                    stored_version = cursor.execute("PRAGMA user_version").fetchone()[0]
+                    if stored_version < SCHEMA_VERSION:
+                        cursor.execute("DROP TABLE IF EXISTS stream_info_cache")
+                    cursor.execute("""
+                        CREATE TABLE IF NOT EXISTS stream_info_cache (
+                            path TEXT PRIMARY KEY,
+                            mtime_ns INTEGER NOT NULL,
+                            size INTEGER NOT NULL,
+                            width INTEGER NOT NULL,
+                            height INTEGER NOT NULL,
+                            codec_name TEXT NOT NULL,
+                            profile TEXT NOT NULL,
+                            pix_fmt TEXT NOT NULL,
+                            master_display TEXT NOT NULL DEFAULT '',
+                            max_cll TEXT NOT NULL DEFAULT '',
+                            bit_rate INTEGER NOT NULL DEFAULT 0
+                        )
+                    """)
+
+                    # Indexes backing the dequeue poll and the heuristics lookup
+                    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at)")
+                    cursor.execute("CREATE INDEX IF NOT EXISTS idx_profiles_lookup ON encoding_profiles(width, height, codec, pix_fmt)")
+                    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
                     
                     conn.commit()
 
-    def _get_connection(self):
-        """Get a thread-safe connection to the SQLite DB."""
-        # Using timeout and isolation_level for concurrency safety
-        return sqlite3.connect(
-            str(self.db_path), 
-            timeout=10.0, 
-            isolation_level='IMMEDIATE'
-        )
+    def _get_connection(self) -> sqlite3.Connection:
+        """
+        Get this thread's cached connection to the SQLite DB.
+        The connection is opened lazily once per thread in WAL mode and reused for every query.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Using timeout and isolation_level for concurrency safety
+            conn = sqlite3.connect(
+                str(self.db_path),
+                timeout=10.0,
+                isolation_level='IMMEDIATE'
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-8000")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close the calling thread's cached connection, if any."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
 
     # --- Job Queue Methods ---
 
@@ -89,11 +144,10 @@ class DatabaseManager:
                 # Exclusive lock
                 fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
                 try:
-                    lines = f.readlines()
-                    for line in lines:
-                        path = line.strip()
-                        if path:
-                            self.add_job(path)
+                    paths = [line.strip() for line in f if line.strip()]
+                    if paths:
+                        queued = self.add_jobs_batch(paths)
+                        logger.info("INGESTED_QUEUE_FILE: %s/%s new jobs", queued, len(paths))
                             
                     # Clear file
                     f.seek(0)
@@ -105,11 +159,11 @@ class DatabaseManager:
             # File is locked by another process
             pass
         except Exception as e:
-            logger.exception(f"Error reading queue file {queue_path}: {e}")
+            logger.exception("Error reading queue file %s: %s", queue_path, e)
 
     def add_job(self, path: str) -> bool:
         """Add a job to the queue if it doesn't already exist."""
-        with self._lock, closing(self._get_connection()) as conn:
+        with self._lock, self._get_connection() as conn:
             cursor = conn.cursor()
             try:
                 cursor.execute(
@@ -122,12 +176,45 @@ class DatabaseManager:
                 # Job path already exists
                 return False
 
+    def add_jobs_batch(self, paths: List[str]) -> int:
+        """
+        Add many jobs to the queue in a single transaction, skipping paths that already exist.
+        Returns: number of newly queued jobs.
+        """
+        if not paths:
+            return 0
+        with self._lock, self._get_connection() as conn:
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO jobs (path, status) VALUES (?, ?)",
+                [(path, JobStatus.PENDING.value) for path in paths]
+            )
+            conn.commit()
+            return cursor.rowcount
+
     def dequeue_pending_job(self) -> Optional[Tuple[int, str]]:
         """
         Atomically find a PENDING job, mark it as PROCESSING, and return it.
         Returns: (job_id, path) or None if queue is empty.
         """
-        with self._lock, closing(self._get_connection()) as conn:
+        if self._supports_returning:
+            # Single-statement claim: the IMMEDIATE write transaction serializes
+            # concurrent workers (threads or processes), so no Python lock is needed.
+            with self._get_connection() as conn:
+                cursor = conn.execute("""
+                    UPDATE jobs SET status = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = (
+                        SELECT id FROM jobs
+                        WHERE status = ?
+                        ORDER BY created_at ASC
+                        LIMIT 1
+                    )
+                    RETURNING id, path
+                """, (JobStatus.PROCESSING.value, JobStatus.PENDING.value))
+                row = cursor.fetchone()
+                conn.commit()
+                return (row[0], row[1]) if row else None
+
+        with self._lock, self._get_connection() as conn:
             cursor = conn.cursor()
             # SQLite doesn't have UPDATE ... RETURNING in older versions, 
             # so we SELECT then UPDATE carefully in a transaction.
@@ -151,7 +238,7 @@ class DatabaseManager:
 
     def update_job_status(self, job_id: int, status: str):
         """Update a job's status (e.g., COMPLETED, FAILED)."""
-        with self._lock, closing(self._get_connection()) as conn:
+        with self._lock, self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "UPDATE jobs SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
@@ -161,7 +248,7 @@ class DatabaseManager:
 
     def update_job_stage(self, job_id: int, stage: str):
         """Write the current pipeline stage so remote clients can poll it in real-time."""
-        with self._lock, closing(self._get_connection()) as conn:
+        with self._lock, self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "UPDATE jobs SET current_stage = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
@@ -175,7 +262,7 @@ class DatabaseManager:
         result should be 'pass' or 'fail'.
         """
         import json
-        with self._lock, closing(self._get_connection()) as conn:
+        with self._lock, self._get_connection() as conn:
             cursor = conn.cursor()
             # Read current JSON
             cursor.execute("SELECT stage_results FROM jobs WHERE id = ?", (job_id,))
@@ -195,7 +282,7 @@ class DatabaseManager:
 
     def update_job_path(self, job_id: int, new_path: str):
         """Update a job's path when domain transforms directories."""
-        with self._lock, closing(self._get_connection()) as conn:
+        with self._lock, self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "UPDATE jobs SET path = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
@@ -205,7 +292,7 @@ class DatabaseManager:
 
     def reset_orphaned_jobs(self):
         """Reset jobs that were marked PROCESSING if the worker crashed."""
-        with self._lock, closing(self._get_connection()) as conn:
+        with self._lock, self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "UPDATE jobs SET status = 'PENDING' WHERE status = 'PROCESSING' AND updated_at <= datetime('now', '-360 minutes')"
@@ -214,7 +301,7 @@ class DatabaseManager:
 
     def cleanup_old_jobs(self, days: int = 30):
         """Delete COMPLETED and REJECTED jobs older than `days`."""
-        with self._lock, closing(self._get_connection()) as conn:
+        with self._lock, self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "DELETE FROM jobs WHERE status IN ('COMPLETED', 'REJECTED') AND updated_at < datetime('now', '-' || ? || ' days')",
@@ -222,32 +309,42 @@ class DatabaseManager:
             )
             conn.commit()
 
+    # --- Stream Info Cache Methods ---
+
+    def get_stream_info(self, path: str, mtime_ns: int, size: int) -> Optional[VideoStreamInfo]:
+        """Return the stored probe result for path if the file is unchanged since it was probed."""
+        conn = self._get_connection()
+        row = conn.execute(
+            f"SELECT {', '.join(_STREAM_INFO_COLUMNS)} FROM stream_info_cache WHERE path = ? AND mtime_ns = ? AND size = ?",
+            (path, mtime_ns, size)
+        ).fetchone()
+        return VideoStreamInfo(**dict(zip(_STREAM_INFO_COLUMNS, row))) if row else None
+
+    def save_stream_info(self, path: str, mtime_ns: int, size: int, info: VideoStreamInfo):
+        """Store a probe result, replacing any entry for an older version of the file."""
+        with self._lock, self._get_connection() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO stream_info_cache (path, mtime_ns, size, {', '.join(_STREAM_INFO_COLUMNS)}) "
+                f"VALUES (?, ?, ?{', ?' * len(_STREAM_INFO_COLUMNS)})",
+                (path, mtime_ns, size, *(getattr(info, name) for name in _STREAM_INFO_COLUMNS))
+            )
+            conn.commit()
+
     # --- Heuristics Methods ---
 
     def get_best_profile(self, width: int, height: int, codec: str, pix_fmt: str) -> Optional[Tuple[int, int, int]]:
         """
         Get the most aggressive known-safe parameters for the given media type.
         Returns: (bf, lad, async_depth) or None if no heuristic is known.
+        Pure read: last_used is refreshed by save_successful_profile when the encode succeeds.
         """
-        with self._lock, closing(self._get_connection()) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT best_bf, best_lad, best_async_depth 
-                FROM encoding_profiles
-                WHERE width = ? AND height = ? AND codec = ? AND pix_fmt = ?
-            """, (width, height, codec, pix_fmt))
-            row = cursor.fetchone()
-            
-            if row:
-                # Update last_used timestamp
-                cursor.execute("""
-                    UPDATE encoding_profiles 
-                    SET last_used = CURRENT_TIMESTAMP 
-                    WHERE width = ? AND height = ? AND codec = ? AND pix_fmt = ?
-                """, (width, height, codec, pix_fmt))
-                conn.commit()
-                return row
-            return None
+        conn = self._get_connection()
+        cursor = conn.execute("""
+            SELECT best_bf, best_lad, best_async_depth 
+            FROM encoding_profiles
+            WHERE width = ? AND height = ? AND codec = ? AND pix_fmt = ?
+        """, (width, height, codec, pix_fmt))
+        return cursor.fetchone()
 
     def save_successful_profile(self, width: int, height: int, codec: str, pix_fmt: str, 
                                 bf: int, lad: int, async_depth: int):
@@ -255,7 +352,7 @@ class DatabaseManager:
         Save the successful parameters for these media characteristics.
         If a profile exists, it overwrites it (assuming recent success = safe fallback state).
         """
-        with self._lock, closing(self._get_connection()) as conn:
+        with self._lock, self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO encoding_profiles 
@@ -1,6 +1,7 @@
 
 import smtplib
 import logging
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
@@ -8,6 +9,46 @@ from config import AppConfig
 
 logger = logging.getLogger(__name__)
 
+# Logged-in SMTP session reused across failures that arrive in quick succession.
+SMTP_CONNECTION_TTL = 60
+_smtp_cache = {"conn": None, "expires": 0.0}
+
+def _close_smtp_connection() -> None:
+    """Tear down the cached SMTP session, ignoring errors from an already-dropped socket."""
+    conn = _smtp_cache["conn"]
+    _smtp_cache["conn"] = None
+    _smtp_cache["expires"] = 0.0
+    if conn is not None:
+        try:
+            conn.quit()
+        except (smtplib.SMTPException, OSError):
+            conn.close()
+
+def _get_smtp_connection(config: AppConfig) -> smtplib.SMTP:
+    """Return the cached SMTP session if still alive, otherwise connect, upgrade and log in."""
+    conn = _smtp_cache["conn"]
+    if conn is not None:
+        try:
+            if time.time() < _smtp_cache["expires"] and conn.noop()[0] == 250:
+                return conn
+        except (smtplib.SMTPException, OSError):
+            pass
+        _close_smtp_connection()
+
+    server_class = smtplib.SMTP_SSL if config.email_smtp_ssl else smtplib.SMTP
+    conn = server_class(config.email_smtp_host, int(config.email_smtp_port))
+    try:
+        if not config.email_smtp_ssl:
+            conn.starttls() # Upgrade connection to secure
+        conn.login(config.email_smtp_username, config.email_smtp_password)
+    except Exception:
+        conn.close()
+        raise
+
+    _smtp_cache["conn"] = conn
+    _smtp_cache["expires"] = time.time() + SMTP_CONNECTION_TTL
+    return conn
+
 def send_failure_email(config: AppConfig, subject: str, body: str, attachment_paths: list = None):
     """
     Send an email notification via SMTP with optional file attachments.
@@ -23,7 +64,9 @@ def send_failure_email(config: AppConfig, subject: str, body: str, attachment_pa
     Behavior:
         - Skips sending if SMTP config is missing/empty.
         - Tries to attach files; logs error but continues if an attachment fails.
+        - Attachments larger than config.email_attachment_max_bytes are cut to their tail.
         - Supports both STARTTLS (port 587) and standard SSL (usually 465, but configurable).
+        - Reuses a logged-in SMTP session for up to SMTP_CONNECTION_TTL seconds.
     """
     if not config.email_recipient or not config.email_smtp_username:
         logger.warning("Email configuration missing. Skipping failure notification.")
@@ -41,26 +84,30 @@ def send_failure_email(config: AppConfig, subject: str, body: str, attachment_pa
             for path in attachment_paths:
                 if path and path.exists():
                     try:
+                        # Bound memory per email: attach only the tail of oversized logs
+                        size = path.stat().st_size
+                        max_bytes = config.email_attachment_max_bytes
+                        attach_name = path.name
                         with open(path, "rb") as f:
-                            part = MIMEApplication(f.read(), Name=path.name)
-                        part['Content-Disposition'] = f'attachment; filename="{path.name}"'
+                            if size > max_bytes:
+                                f.seek(size - max_bytes)
+                                attach_name = f"tail_{path.name}"
+                            part = MIMEApplication(f.read(max_bytes), Name=attach_name)
+                        part['Content-Disposition'] = f'attachment; filename="{attach_name}"'
                         msg.attach(part)
                     except Exception as e:
-                        logger.warning(f"Failed to attach file {path}: {e}", exc_info=True)
+                        logger.warning("Failed to attach file %s: %s", path, e, exc_info=True)
 
-        # Connect to SMTP Server safely using a Context Manager to prevent socket leaks
-        server_class = smtplib.SMTP_SSL if config.email_smtp_ssl else smtplib.SMTP
-        
-        with server_class(config.email_smtp_host, int(config.email_smtp_port)) as server:
-            if not config.email_smtp_ssl:
-                server.starttls() # Upgrade connection to secure
-                
-            server.login(config.email_smtp_username, config.email_smtp_password)
-            server.send_message(msg)
+        # Reuse the cached session; rebuild once if the server dropped it since the last check
+        try:
+            _get_smtp_connection(config).send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            _close_smtp_connection()
+            _get_smtp_connection(config).send_message(msg)
         
-        logger.info(f"Failure notification sent to {config.email_recipient}")
+        logger.info("Failure notification sent to %s", config.email_recipient)
         return True
 
     except Exception as e:
-        logger.exception(f"Failed to send email: {e}")
+        logger.exception("Failed to send email: %s", e)
         return False
@@ -4,41 +4,24 @@ Implements the Strategy and Builder patterns for Domain-Driven Design.
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from itertools import chain
+from typing import Iterable, List, Optional
 from pathlib import Path
 import logging
 import subprocess
-import json
 import datetime
 
 from config import AppConfig
-from models import MediaItem
+from models import MediaItem, probe_streams
 
 logger = logging.getLogger(__name__)
 
 def get_audio_streams(movie_file: Path, config: AppConfig) -> List[dict]:
     try:
-        result = subprocess.run(
-            [
-                str(config.ffprobe_path),
-                "-v",
-                "error",
-                "-select_streams",
-                "a",
-                "-show_entries",
-                "stream=index,channels:stream_tags=language",
-                "-of",
-                "json",
-                str(movie_file),
-            ],
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-
-        probe_data = json.loads(result.stdout)
         audio_streams = []
-        for stream in probe_data.get("streams", []):
+        for stream in probe_streams(movie_file, config):
+            if stream.get("codec_type") != "audio":
+                continue
             index = stream.get("index")
             channels = stream.get("channels", 2)
             lang = stream.get("tags", {}).get("language", "und").lower()
@@ -53,7 +36,7 @@ class FFmpegCommandBuilder:
     """Builder pattern for constructing FFmpeg commands cleanly."""
     
     def __init__(self, config: AppConfig):
-        self._cmd: List[str] = [str(config.ffmpeg_path), "-y"]
+        self._cmd: List[str] = [config.ffmpeg_path_s, "-y"]
         self._inputs: List[str] = []
         self._filters: List[str] = []
         self._maps: List[str] = []
@@ -77,6 +60,10 @@ class FFmpegCommandBuilder:
         self._maps.extend(["-map", map_val])
         return self
 
+    def add_maps(self, map_vals: Iterable[str]):
+        self._maps.extend(chain.from_iterable(("-map", m) for m in map_vals))
+        return self
+
     def add_filter(self, filter_str: str):
         self._filters.append(filter_str)
         return self
@@ -104,24 +91,24 @@ class FFmpegCommandBuilder:
         return self
 
     def build(self) -> List[str]:
-        final_cmd = self._cmd.copy()
-        final_cmd.extend(self._global_opts)
-        final_cmd.extend(self._inputs)
-        final_cmd.extend(self._maps)
-        
-        if self._filters:
-            # Join multiple filters with comma
-            final_cmd.extend(["-vf", ",".join(self._filters)])
-            
-        final_cmd.extend(self._video_opts)
-        final_cmd.extend(self._audio_opts)
-        final_cmd.extend(self._output_opts)
-        
         if not self._output:
             raise ValueError("Output path not set for FFmpegCommandBuilder")
-            
-        final_cmd.append(self._output)
-        return final_cmd
+        
+        # Join multiple filters with comma
+        filter_opts = ("-vf", ",".join(self._filters)) if self._filters else ()
+        
+        # Single allocation for the final argv instead of copy + repeated extend
+        return list(chain(
+            self._cmd,
+            self._global_opts,
+            self._inputs,
+            self._maps,
+            filter_opts,
+            self._video_opts,
+            self._audio_opts,
+            self._output_opts,
+            (self._output,),
+        ))
 
 
 class EncoderStrategy(ABC):
@@ -130,15 +117,88 @@ class EncoderStrategy(ABC):
         self.config = config
 
     @abstractmethod
-    def build_command(self, media_item: MediaItem, temp_output: Path, bf: int, lad: int, async_depth: int) -> FFmpegCommandBuilder:
+    def build_command(self, media_item: MediaItem, temp_output: Path, bf: int, lad: int, async_depth: int, hyper: bool = False) -> FFmpegCommandBuilder:
         """Construct the FFmpeg encoding command."""
         pass
 
+    @abstractmethod
+    def build_remux_command(self, media_item: MediaItem, temp_output: Path) -> FFmpegCommandBuilder:
+        """Construct a stream-copy command for sources that are already HEVC."""
+        pass
+
 
 class IntelQSVStrategy(EncoderStrategy):
     """Concrete Strategy maximizing Intel Gen9.5 QSV hardware acceleration."""
 
-    def build_command(self, media_item: MediaItem, temp_output: Path, bf: int, lad: int, async_depth: int) -> FFmpegCommandBuilder:
+    def _add_qsv_device(self, builder: FFmpegCommandBuilder) -> None:
+        """Initialise the QSV device once under the name 'hw' and bind the filter graph to it."""
+        builder.add_global_option("-init_hw_device", f"qsv=hw:{self.config.qsv_device}")
+        builder.add_global_option("-filter_hw_device", "hw")
+
+    def _hwupload_filter(self) -> str:
+        """Upload filter with a dynamic surface pool (jellyfin-ffmpeg builds only) or a fixed pool of 16."""
+        if self.config.qsv_dynamic_pool:
+            return "hwupload=extra_hw_frames=dynamic"
+        return "hwupload=extra_hw_frames=16"
+
+    def build_command(self, media_item: MediaItem, temp_output: Path, bf: int, lad: int, async_depth: int, hyper: bool = False) -> FFmpegCommandBuilder:
+        builder = self._base_builder(media_item, temp_output, bf, lad, async_depth, hyper)
+        opts = self._tier_options(bf, lad, async_depth)
+        for flag, value in zip(opts[::2], opts[1::2]):
+            builder.add_video_option(flag, value)
+        return builder
+
+    def _extra_hw_frames(self, bf: int, lad: int, async_depth: int) -> int:
+        """Decoder surface pool headroom: B-frame reordering + look-ahead + in-flight async frames."""
+        lookahead = lad if self.config.qsv_generation >= 11 else 0
+        return max(16, lookahead + bf + async_depth + 8)
+
+    def _tier_options(self, bf: int, lad: int, async_depth: int) -> List[str]:
+        opts = ["-async_depth", str(async_depth), "-bf", str(bf)]
+        if self.config.qsv_generation >= 11:
+            # Gen9.5 has no HEVC look_ahead (runs with -look_ahead 0, see _base_builder)
+            opts += ["-look_ahead_depth", str(lad)]
+        return opts
+
+    def build_remux_command(self, media_item: MediaItem, temp_output: Path) -> FFmpegCommandBuilder:
+        builder = FFmpegCommandBuilder(self.config)
+        builder.add_global_option("-thread_queue_size", "4096")
+        builder.add_input(str(media_item.source_path))
+
+        # Same stream layout as the encode path, but the HEVC video is copied bit-exact.
+        builder.add_map("0:v:0")
+        builder.add_video_option("-map_metadata", "0")
+        builder.add_video_option("-map_chapters", "-1")
+        builder.add_video_option("-sn")
+        builder.add_video_option("-dn")
+        builder.add_video_option("-c:v", "copy")
+        builder.add_video_option("-tag:v", "hvc1")
+        self._add_audio_streams(builder, media_item)
+
+        builder.add_output_option("-movflags", "+faststart")
+        builder.add_output_option("-max_muxing_queue_size", "9999")
+        builder.add_output_option("-avoid_negative_ts", "make_zero")
+        builder.set_output(str(temp_output))
+        return builder
+
+    def _add_audio_streams(self, builder: FFmpegCommandBuilder, media_item: MediaItem) -> None:
+        """Map every audio stream and downmix it to stereo AAC."""
+        audio_streams = get_audio_streams(media_item.source_path, self.config)
+        builder.add_maps(f"0:{stream.get('index')}" for stream in audio_streams)
+        for i, stream in enumerate(audio_streams):
+            channels = stream.get('channels', 2)
+            lang = stream.get('lang', 'und')
+            builder.add_audio_option(f"-c:a:{i}", "aac")
+            builder.add_audio_option(f"-ac:{i}", "2")
+            builder.add_audio_option(f"-af:{i}", "aresample=ochl=stereo")
+            if channels >= 6:
+                builder.add_audio_option(f"-b:a:{i}", "256k")
+            else:
+                builder.add_audio_option(f"-b:a:{i}", "192k")
+            if lang and lang != "und":
+                builder.add_audio_option(f"-metadata:s:a:{i}", f"language={lang}")
+
+    def _base_builder(self, media_item: MediaItem, temp_output: Path, bf: int, lad: int, async_depth: int, hyper: bool) -> FFmpegCommandBuilder:
         builder = FFmpegCommandBuilder(self.config)
         stream_info = media_item.stream_info
         
@@ -171,23 +231,33 @@ class IntelQSVStrategy(EncoderStrategy):
             logger.warning("4K source detected. Forcing Hybrid Software Decode to perform 1080p downscale.")
 
         # Base hwaccel options
-        if is_hw_supported:
+        if hyper:
+            # Hyper Encode spans iGPU + dGPU, so the MFX session must not be pinned to a single render node.
+            builder.add_global_option("-init_hw_device", "qsv=hw:hw,child_device_type=vaapi")
+            builder.add_global_option("-filter_hw_device", "hw")
+            if is_hw_supported:
+                builder.add_global_option("-hwaccel", "qsv")
+                builder.add_global_option("-hwaccel_output_format", "qsv")
+            builder.add_global_option("-extra_hw_frames", "60")
+        elif is_hw_supported:
+            # One named MFX session shared by decoder, vpp_qsv and hevc_qsv: frames never leave VRAM.
+            self._add_qsv_device(builder)
             builder.add_global_option("-hwaccel", "qsv")
-            builder.add_global_option("-qsv_device", self.config.qsv_device)
+            builder.add_global_option("-hwaccel_device", "hw")
             builder.add_global_option("-hwaccel_output_format", "qsv")
+            builder.add_global_option("-extra_hw_frames", str(self._extra_hw_frames(bf, lad, async_depth)))
         else:
-            builder.add_global_option("-init_hw_device", f"qsv=hw:{self.config.qsv_device}")
-            builder.add_global_option("-filter_hw_device", "hw")
+            self._add_qsv_device(builder)
         
         # HDR metadata preservation
         builder.add_video_option("-map_metadata", "0")
 
         # Smart fallback threading
         if not is_hw_supported:
-            logger.info(f"PIPELINE: HYBRID (Software Decode -> Hardware Encode) [BF={bf}]")
+            logger.info("PIPELINE: HYBRID (Software Decode -> Hardware Encode)")
             builder.add_global_option("-threads", "6")
         else:
-            logger.info(f"PIPELINE: FULL HW (Hardware Decode -> Hardware Encode) [BF={bf}]")
+            logger.info("PIPELINE: FULL HW (Hardware Decode -> Hardware Encode)")
 
         # Maximize thread queue size
         builder.add_global_option("-thread_queue_size", "4096")
@@ -201,31 +271,17 @@ class IntelQSVStrategy(EncoderStrategy):
         builder.add_video_option("-dn")
         
         # Audio mapping
-        audio_streams = get_audio_streams(media_item.source_path, self.config)
-        for i, stream in enumerate(audio_streams):
-            idx = stream.get('index')
-            channels = stream.get('channels', 2)
-            lang = stream.get('lang', 'und')
-            builder.add_map(f"0:{idx}")
-            builder.add_audio_option(f"-c:a:{i}", "aac")
-            builder.add_audio_option(f"-ac:{i}", "2")
-            builder.add_audio_option(f"-af:{i}", "aresample=ochl=stereo")
-            if channels >= 6:
-                builder.add_audio_option(f"-b:a:{i}", "256k")
-            else:
-                builder.add_audio_option(f"-b:a:{i}", "192k")
-            if lang and lang != "und":
-                builder.add_audio_option(f"-metadata:s:a:{i}", f"language={lang}")
+        self._add_audio_streams(builder, media_item)
 
         # --- FILTERS ---
         if not is_hw_supported and (stream_info.width != 1920 or stream_info.height != 1080):
             pad_filter = "scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2"
             builder.add_filter(pad_filter)
             sw_fmt = "p010le" if ('10' in stream_info.pix_fmt or 'p010' in stream_info.pix_fmt) else "nv12"
-            builder.add_filter(f"format={sw_fmt},hwupload=extra_hw_frames=64")
+            builder.add_filter(f"format={sw_fmt},{self._hwupload_filter()}")
         elif not is_hw_supported:
             sw_fmt = "p010le" if ('10' in stream_info.pix_fmt or 'p010' in stream_info.pix_fmt) else "nv12"
-            builder.add_filter(f"format={sw_fmt},hwupload=extra_hw_frames=64")
+            builder.add_filter(f"format={sw_fmt},{self._hwupload_filter()}")
         else:
             hw_format = "p010le" if ('10' in stream_info.pix_fmt or 'p010' in stream_info.pix_fmt) else "nv12"
             w_h = ""
@@ -240,13 +296,11 @@ class IntelQSVStrategy(EncoderStrategy):
                 filter_parts.append(f"denoise={denoise_level}")
             if w_h:
                 filter_parts.append(w_h.lstrip(':'))
-                
-            if filter_parts:
-                filter_parts.append(f"format={hw_format}")
-                vpp_filter = f"vpp_qsv={':'.join(filter_parts)}"
-                builder.add_filter(vpp_filter)
-            else:
-                builder.add_filter(f"vpp_qsv=format={hw_format}")
+            # Let vpp_qsv queue as many frames as the encoder instead of syncing every frame
+            filter_parts.append(f"async_depth={async_depth}")
+            filter_parts.append(f"format={hw_format}")
+            vpp_filter = f"vpp_qsv={':'.join(filter_parts)}"
+            builder.add_filter(vpp_filter)
 
         # --- ENCODER OPTIONS ---
         builder.add_video_option("-c:v", "hevc_qsv")
@@ -262,16 +316,24 @@ class IntelQSVStrategy(EncoderStrategy):
             builder.add_video_option("-cll", stream_info.max_cll)
         
         # QSV Customizations
-        # NOTE: Gen9.5 HEVC does not support look_ahead. Disabled to prevent QSV runtime errors.
-        builder.add_video_option("-look_ahead", "0")
-        # builder.add_video_option("-look_ahead_depth", str(lad))  # Unused when look_ahead=0
-        builder.add_video_option("-async_depth", str(async_depth))
+        if self.config.qsv_generation >= 11:
+            # Gen11+ encodes HEVC on the VDENC fixed-function block, which honours look_ahead via extbrc.
+            builder.add_video_option("-low_power", "1")
+            builder.add_video_option("-extbrc", "1")
+        else:
+            # NOTE: Gen9.5 HEVC has neither VDENC (low_power) nor look_ahead. Both cause QSV runtime errors.
+            builder.add_video_option("-look_ahead", "0")
+        # -async_depth, -bf and -look_ahead_depth are per-tier; see build_command.
         
         # Golden standard controls
-        builder.add_video_option("-bf", str(bf))
-        builder.add_video_option("-g", "240")
+        builder.add_video_option("-g", "60" if hyper else "240")
         # Gen9.5 HEVC does not support ICQ, fallback to CQP
         builder.add_video_option("-rc_mode", "cqp")
+
+        if hyper:
+            # Only offered on Gen12+ (see ProcessingPipeline), where low_power is already set above
+            logger.info("HYPER ENCODE: dual_gfx enabled with low_power VDENC")
+            builder.add_video_option("-dual_gfx", "on")
         
         # Output options
         builder.add_output_option("-max_muxing_queue_size", "9999")
@@ -282,19 +344,29 @@ class IntelQSVStrategy(EncoderStrategy):
         
         return builder
 
-def execute_process(args: List[str], wait_for_completion: bool = True, config: Optional[AppConfig] = None, log_name: str = "ffmpeg") -> Optional[subprocess.Popen]:
-    """Execute generic subprocess correctly."""
+def execute_process(args: List[str], wait_for_completion: bool = True, config: Optional[AppConfig] = None, log_name: str = "ffmpeg", log_path: Optional[Path] = None) -> Optional[subprocess.Popen]:
+    """
+    Execute generic subprocess correctly.
+    When log_path is given, output is appended to that (per-job) file instead of a new timestamped log.
+    ffmpeg writes straight to the log fd, so nothing is buffered in Python while it runs.
+    Spawned with close_fds=False and no preexec_fn/shell/cwd so CPython can use os.posix_spawn
+    instead of fork+exec (our fds are non-inheritable per PEP 446, so nothing leaks).
+    """
     log_file = None
     try:
         if config:
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            log_file_path = config.log_ffmpeg_dir / f"{log_name}_{timestamp}.log"
-            log_file = open(log_file_path, "w", encoding="utf-8")
+            if log_path is not None:
+                log_file_path = log_path
+            else:
+                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+                log_file_path = config.log_ffmpeg_dir / f"{log_name}_{timestamp}.log"
+            log_file = open(log_file_path, "a", encoding="utf-8")
             log_file.write(f"Start: {datetime.datetime.now()}\nCommand: {' '.join(str(a) for a in args)}\n" + "-"*80 + "\n")
             log_file.flush()
-            proc = subprocess.Popen(args, stdout=log_file, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, text=True)
+            proc = subprocess.Popen(args, stdout=log_file, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, text=True, close_fds=False)
         else:
-            proc = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, stdin=subprocess.DEVNULL, text=True)
+            # No log file: inherit our stderr. A PIPE nobody drains would deadlock proc.wait() once ffmpeg fills it.
+            proc = subprocess.Popen(args, stdout=subprocess.DEVNULL, stdin=subprocess.DEVNULL, text=True, close_fds=False)
         
         if not wait_for_completion:
             # Caller is responsible for calling proc.log_file.close() after proc finishes.
@@ -3,12 +3,15 @@ import shutil
 import os
 import threading
 import logging
-from pathlib import Path
-from typing import Optional
+from pathlib import Path, PurePosixPath
+from typing import FrozenSet, List, Optional
 from config import AppConfig
 
 logger = logging.getLogger(__name__)
 
+VIDEO_EXTENSIONS: FrozenSet[str] = frozenset({'.mkv', '.mp4', '.avi', '.m4v'})
+SEEDING_ROOT = PurePosixPath("/share/seeding")
+
 def linux_mv(source: Path, dest: Path, shutdown_event: Optional[threading.Event] = None) -> None:
     """Robust cross-device file move."""
     try:
@@ -22,6 +25,26 @@ def linux_mv(source: Path, dest: Path, shutdown_event: Optional[threading.Event]
         shutil.copy2(str(source), str(dest))
         source.unlink(missing_ok=True)
 
+def walk_media_files(root: Path, extensions: FrozenSet[str] = VIDEO_EXTENSIONS) -> List[Path]:
+    """
+    Recursively collect files under root whose (case-insensitive) suffix is in extensions.
+    Single os.scandir traversal instead of one rglob walk per extension.
+    """
+    found: List[Path] = []
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in extensions:
+                        found.append(Path(entry.path))
+        except OSError as e:
+            logger.warning(f"Cannot scan directory {current}: {e}")
+    return found
+
 def validate_target_root(target_path: Path) -> bool:
     """Return True if path exists, is a directory, and is writable using os.access(path, os.W_OK)"""
     if not target_path.exists():
@@ -33,7 +56,9 @@ def validate_target_root(target_path: Path) -> bool:
     return True
 
 def validate_tool_paths(config: AppConfig) -> bool:
-    """Verify all required tools are accessible."""
+    """Verify all required tools are accessible. A successful result is memoized on the config."""
+    if config._tools_validated:
+        return True
     
     tools = {
         "FFmpeg": config.ffmpeg_path,
@@ -45,7 +70,9 @@ def validate_tool_paths(config: AppConfig) -> bool:
     missing_tools = []
     
     for tool_name, tool_path in tools.items():
-        if not tool_path.exists():
+        try:
+            os.stat(tool_path)
+        except OSError:
             missing_tools.append(f"{tool_name}: {tool_path}")
             logger.error("MISSING: %s", tool_name)
         else:
@@ -55,6 +82,7 @@ def validate_tool_paths(config: AppConfig) -> bool:
         logger.error("MISSING_REQUIRED_TOOLS")
         return False
     
+    object.__setattr__(config, '_tools_validated', True)
     logger.info("All_tools_accessible")
     return True
 
@@ -63,10 +91,10 @@ def validate_tool_paths(config: AppConfig) -> bool:
 
 def should_process_path(linux_path: Path) -> bool:
     """
-    Reject paths that start with /share/seeding.
+    Reject paths under /share/seeding.
+    Compared component-wise, so siblings such as /share/seeding2 are not caught by the prefix.
     """
-    path_str = str(linux_path).strip()
-    if path_str.startswith("/share/seeding"):
+    if linux_path.is_relative_to(SEEDING_ROOT):
         logger.warning(f"PATH_REJECTED (seeding path): {linux_path}")
         return False
     return True
@@ -13,7 +13,7 @@ import traceback
 import re
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Tuple
 from config import AppConfig
 try:
     from concurrent_log_handler import ConcurrentRotatingFileHandler
@@ -25,6 +25,15 @@ log_lock = threading.Lock()
 logger: Optional[logging.Logger] = None
 current_job_handler: Optional[logging.Handler] = None
 
+# Characters that are unsafe in log file names
+_SAFE_NAME_RE = re.compile(r'[\\/*?:"<>| ]')
+
+# Shared by the console and every per-job handler; formatters are stateless, so one instance is enough
+LOG_FORMATTER = logging.Formatter(
+    fmt='%(asctime)s - [PID:%(process)d] - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d_%H:%M:%S'
+)
+
 
 def setup_logging(config: AppConfig) -> Optional[logging.Logger]:
     """
@@ -37,15 +46,11 @@ def setup_logging(config: AppConfig) -> Optional[logging.Logger]:
         config.log_dir.mkdir(parents=True, exist_ok=True)
         config.log_general_dir.mkdir(exist_ok=True)
         config.log_ffmpeg_dir.mkdir(exist_ok=True)
+        object.__setattr__(config, '_log_dirs_ready', True)
         
         # Console handler for stdout (always active)
         console_handler = logging.StreamHandler(sys.stdout)
-        
-        log_format = logging.Formatter(
-            fmt='%(asctime)s - [PID:%(process)d] - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d_%H:%M:%S'
-        )
-        console_handler.setFormatter(log_format)
+        console_handler.setFormatter(LOG_FORMATTER)
         
         # Clear any existing handlers to avoid duplicates
         root_logger = logging.getLogger()
@@ -76,30 +81,33 @@ def get_process_log_file(config: AppConfig, movie_name: str) -> Path:
     """
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     # Cleaned name is usually passed in, but sanitize just in case
-    safe_movie_name = re.sub(r'[\\//*?:"<>| ]', "_", movie_name)
+    safe_movie_name = _SAFE_NAME_RE.sub("_", movie_name)
     
     return config.log_ffmpeg_dir / f"{safe_movie_name}_{timestamp}.log"
 
-def start_job_logging(config: AppConfig, log_name: str):
+def start_job_logging(config: AppConfig, log_name: str) -> Tuple[Path, Path]:
     """
     Switch logging to a job-specific file in LOG_GENERAL_DIR.
     Format: LOG_GENERAL_DIR / CleanedName_Date.log
-    Returns the path to the log file.
+    Returns (general_log_path, ffmpeg_log_path); FFmpeg output for the job is written to the latter.
     """
     global current_job_handler
     
     root_logger = logging.getLogger()
     
     # Create new job handler
-    safe_name = re.sub(r'[\\//*?:"<>| ]', "_", log_name)
+    safe_name = _SAFE_NAME_RE.sub("_", log_name)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
     # LOG_GENERAL_DIR should strictly be used for application logic logs
     log_file = config.log_general_dir / f"{safe_name}_{timestamp}.log"
     
-    # Ensure directory exists (redundant if setup_logging verified it, but safe)
-    config.log_general_dir.mkdir(exist_ok=True)
+    # Ensure directory exists (skipped once setup_logging has created it)
+    if not config._log_dirs_ready:
+        config.log_general_dir.mkdir(exist_ok=True)
     
+    # One handler per job: ConcurrentRotatingFileHandler binds its lock file to the log filename at
+    # construction, so a cached handler cannot safely be re-pointed at the next job's file.
     current_job_handler = ConcurrentRotatingFileHandler(
         str(log_file),
         mode='a',
@@ -107,19 +115,14 @@ def start_job_logging(config: AppConfig, log_name: str):
         backupCount=5,
         encoding='utf-8'
     )
-    
-    log_format = logging.Formatter(
-        fmt='%(asctime)s - [PID:%(process)d] - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d_%H:%M:%S'
-    )
-    current_job_handler.setFormatter(log_format)
+    current_job_handler.setFormatter(LOG_FORMATTER)
     
     root_logger.addHandler(current_job_handler)
     
     # Log the switch
     logging.info(f"STARTED_JOB_LOGGING: {log_name} -> {log_file}")
     
-    return log_file
+    return log_file, get_process_log_file(config, log_name)
 
 
 def restore_main_logging() -> None:
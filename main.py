@@ -23,18 +23,19 @@ from config import AppConfig
 # Global flag for graceful shutdown
 shutdown_event = threading.Event()
 
+logger = logging.getLogger(__name__)
+
 
 def signal_handler(signum, frame) -> None:
     """Handle graceful shutdown on SIGTERM/SIGINT."""
     global shutdown_event
     
-    logger = logging.getLogger(__name__)
     try:
         sig_name = signal.Signals(signum).name
     except Exception:
         sig_name = str(signum)
         
-    logger.info(f"SIGNAL_RECEIVED: {sig_name}")
+    logger.info("SIGNAL_RECEIVED: %s", sig_name)
     logger.info("SHUTTING_DOWN_GRACEFULLY (will finish current job)")
 
     shutdown_event.set()
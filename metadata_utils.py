@@ -4,37 +4,82 @@ import urllib.request
 import urllib.parse
 import json
 import re
-from typing import Optional, Tuple
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import closing
+from typing import List, Optional, Tuple
 from difflib import SequenceMatcher
 from config import AppConfig
 
 logger = logging.getLogger(__name__)
 
-def search_movie_tmdb(config: AppConfig, raw_filename: str, query: str, year: Optional[str] = None) -> Optional[Tuple[str, str]]:
-    """
-    Search for a movie on TMDB using the Read Access Token.
-    Returns the best matching title from the top 5 results based on difflib scoring.
-    """
-    if not config.tmdb_read_access_token:
-        logger.warning("tmdb_read_access_token not set in config.")
+# Query cleaning patterns, compiled once at import
+_BRACKET_RE = re.compile(r'\[[^\]]*\]|\([^)]*\)')
+_SEP_RE = re.compile(r'[\._]')
+_RES_RE = re.compile(r'(1080|720|2160)p?.*', re.IGNORECASE)
+
+# In-process LRU in front of the sqlite cache: re-scans of the same title skip both HTTP and sqlite.
+# Entries carry their fetch time so they expire with tmdb_cache_ttl like the rows on disk.
+_CANDIDATE_MEMO_SIZE = 2048
+_candidate_memo: "OrderedDict[Tuple[str, str], Tuple[float, List[Tuple[str, str]]]]" = OrderedDict()
+
+def _memo_get(config: AppConfig, key: Tuple[str, str]) -> Optional[List[Tuple[str, str]]]:
+    entry = _candidate_memo.get(key)
+    if entry is None:
         return None
+    if entry[0] <= time.time() - config.tmdb_cache_ttl:
+        del _candidate_memo[key]
+        return None
+    _candidate_memo.move_to_end(key)
+    return entry[1]
+
+def _memo_put(key: Tuple[str, str], candidates: List[Tuple[str, str]]) -> None:
+    _candidate_memo[key] = (time.time(), candidates)
+    _candidate_memo.move_to_end(key)
+    if len(_candidate_memo) > _CANDIDATE_MEMO_SIZE:
+        _candidate_memo.popitem(last=False)
 
+def _cache_connect(config: AppConfig) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(config.tmdb_cache_path), timeout=10)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS tmdb_search (query TEXT NOT NULL, year TEXT NOT NULL, "
+        "candidates TEXT NOT NULL, fetched_at REAL NOT NULL, PRIMARY KEY (query, year))"
+    )
+    return conn
+
+def _cache_get(config: AppConfig, clean_query: str, year: Optional[str]) -> Optional[List[Tuple[str, str]]]:
+    """Return cached TMDB candidates for (query, year) if younger than tmdb_cache_ttl."""
     try:
-        # --- Query Cleaning ---
-        # Raw filenames often contain noise like [Group], (1080p), etc. that confuse the API.
-        
-        # 1. Remove content in brackets [] and ()
-        clean_query = re.sub(r'\[.*?\]', '', query)
-        clean_query = re.sub(r'\(.*?\)', '', clean_query)
-        
-        # 2. Replace separators with spaces
-        clean_query = re.sub(r'[\._]', ' ', clean_query)
-        
-        # 3. Strip resolution and other common tags from the end
-        clean_query = re.sub(r'(1080|720|2160)p?.*', '', clean_query, flags=re.IGNORECASE)
-        
-        clean_query = clean_query.strip()
-        
+        with closing(_cache_connect(config)) as conn:
+            row = conn.execute(
+                "SELECT candidates FROM tmdb_search WHERE query = ? AND year = ? AND fetched_at > ?",
+                (clean_query.lower(), year or "", time.time() - config.tmdb_cache_ttl)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+    except (sqlite3.Error, ValueError) as e:
+        logger.warning(f"TMDB cache read failed: {e}")
+        return None
+
+def _cache_put(config: AppConfig, clean_query: str, year: Optional[str], candidates: List[Tuple[str, str]]) -> None:
+    try:
+        with closing(_cache_connect(config)) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO tmdb_search (query, year, candidates, fetched_at) VALUES (?, ?, ?, ?)",
+                (clean_query.lower(), year or "", json.dumps(candidates), time.time())
+            )
+    except sqlite3.Error as e:
+        logger.warning(f"TMDB cache write failed: {e}")
+
+def _fetch_candidates(config: AppConfig, clean_query: str, year: Optional[str]) -> Optional[List[Tuple[str, str]]]:
+    """Return up to 5 (title, year) TMDB candidates, from memo, disk cache or API. None on API failure."""
+    key = (clean_query.lower(), year or "")
+    candidates = _memo_get(config, key)
+    if candidates is not None:
+        return candidates
+    
+    candidates = _cache_get(config, clean_query, year)
+    if candidates is None:
         encoded_query = urllib.parse.quote(clean_query)
         url = f"https://api.themoviedb.org/3/search/movie?query={encoded_query}&include_adult=false&language=en-US&page=1"
         
@@ -55,33 +100,69 @@ def search_movie_tmdb(config: AppConfig, raw_filename: str, query: str, year: Op
                 return None
             
             data = json.loads(response.read().decode('utf-8'))
-            results = data.get('results', [])
-            
-            if not results:
-                logger.info(f"No TMDB results found for: {clean_query}")
-                return None
-            
-            top_results = results[:5]
-            best_match = None
-            highest_score = 0.0
-            
-            for movie in top_results:
-                title = movie.get('title')
-                release_date = movie.get('release_date', '')
-                year_found = release_date[:4] if len(release_date) >= 4 else ""
-                
-                compare_str = f"{title} {year_found}".strip()
-                score = SequenceMatcher(None, compare_str.lower(), raw_filename.lower()).ratio()
-                
-                if score > highest_score:
-                    highest_score = score
-                    best_match = (title, year_found)
-                    
-            if best_match:
-                logger.info(f"TMDB Best Match: {best_match[0]} ({best_match[1]}) - Score: {highest_score:.2f}")
-                return best_match
-            
+        
+        candidates = []
+        for movie in data.get('results', [])[:5]:
+            release_date = movie.get('release_date', '')
+            candidates.append((movie.get('title'), release_date[:4] if len(release_date) >= 4 else ""))
+        if candidates:
+            _cache_put(config, clean_query, year, candidates)
+    else:
+        logger.info(f"TMDB cache hit: {clean_query}")
+    
+    # Empty results are not memoized, so a title TMDB adds later is found on the next lookup
+    if candidates:
+        _memo_put(key, candidates)
+    return candidates
+
+def search_movie_tmdb(config: AppConfig, raw_filename: str, query: str, year: Optional[str] = None) -> Optional[Tuple[str, str]]:
+    """
+    Search for a movie on TMDB using the Read Access Token.
+    Returns the best matching title from the top 5 results based on fuzzy scoring.
+    """
+    if not config.tmdb_read_access_token:
+        logger.warning("tmdb_read_access_token not set in config.")
+        return None
+
+    try:
+        # --- Query Cleaning ---
+        # Raw filenames often contain noise like [Group], (1080p), etc. that confuse the API.
+        
+        # 1. Remove content in brackets [] and ()
+        clean_query = _BRACKET_RE.sub('', query)
+        
+        # 2. Replace separators with spaces
+        clean_query = _SEP_RE.sub(' ', clean_query)
+        
+        # 3. Strip resolution and other common tags from the end
+        clean_query = _RES_RE.sub('', clean_query)
+        
+        clean_query = clean_query.strip()
+        
+        candidates = _fetch_candidates(config, clean_query, year)
+        if candidates is None:
+            return None
+        if not candidates:
+            logger.info(f"No TMDB results found for: {clean_query}")
             return None
+        
+        # Scoring runs per call: the cache holds TMDB's candidates, not the match for one filename
+        best_match = None
+        highest_score = 0.0
+        target = raw_filename.lower()
+        choices = [f"{title} {year_found}".strip().lower() for title, year_found in candidates]
+        
+        for compare_str, candidate in zip(choices, candidates):
+            score = SequenceMatcher(None, compare_str, target).ratio()
+            if score > highest_score:
+                highest_score = score
+                best_match = tuple(candidate)
+                
+        if best_match:
+            logger.info(f"TMDB Best Match: {best_match[0]} ({best_match[1]}) - Score: {highest_score:.2f}")
+            return best_match
+        
+        return None
 
     except Exception as e:
         logger.error(f"Error querying TMDB: {e}")
@@ -5,10 +5,15 @@ Domain models for the video conversion system.
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from enum import Enum, auto
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import os
+import stat
 import subprocess
+import threading
 import json
 import re
 from typing import TYPE_CHECKING
@@ -16,17 +21,21 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from db_utils import DatabaseManager
     from encoding_utils import EncoderStrategy
-    import threading
 
 from exceptions import MediaValidationError
 from config import AppConfig
 from tvseries_utils import sanitize_tvseries_name, clean_season_folder_name
 from movie_utils import sanitize_movie_name, get_largest_movie_file, cleanup_movie_directory
-from file_utils import linux_mv
+from file_utils import linux_mv, walk_media_files
 
 logger = logging.getLogger(__name__)
 
-@dataclass(frozen=True)
+# Header fields (size, codec, profile, pix_fmt, HDR side data) sit in the first MB / second of the
+# stream; the default 5 MB / 5 s analysis window only slows the probe down.
+FAST_PROBE_SIZE = "1000000"
+FAST_PROBE_DURATION = "1000000"
+
+@dataclass(frozen=True, slots=True)
 class VideoStreamInfo:
     width: int
     height: int
@@ -35,20 +44,46 @@ class VideoStreamInfo:
     pix_fmt: str
     master_display: str = ""
     max_cll: str = ""
+    bit_rate: int = 0
     
     @classmethod
-    def from_file(cls, filepath: Path, config: 'AppConfig') -> 'VideoStreamInfo':
+    def from_file(cls, filepath: Path, config: 'AppConfig', stat_result: Optional[os.stat_result] = None,
+                  db: Optional['DatabaseManager'] = None) -> 'VideoStreamInfo':
+        """
+        Extract stream info, reusing a previous probe while the file's mtime and size are unchanged.
+        With a db, results also persist across runs in its stream_info_cache table.
+        """
+        st = stat_result
+        if st is None:
+            try:
+                st = filepath.stat()
+            except OSError as e:
+                raise MediaValidationError(f"Failed to parse media info: {e}")
+        path_str = str(filepath)
+        if db is not None:
+            info = db.get_stream_info(path_str, st.st_mtime_ns, st.st_size)
+            if info is not None:
+                return info
+        info = _cached_stream_info(path_str, st.st_mtime_ns, st.st_size, config.ffprobe_path_s,
+                                   config.fast_probe, config.ffprobe_timeout_sec)
+        if db is not None:
+            db.save_stream_info(path_str, st.st_mtime_ns, st.st_size, info)
+        return info
+
+    @classmethod
+    def probe(cls, filepath: Path, ffprobe_path: str, fast_probe: bool = True, timeout: Optional[float] = None) -> 'VideoStreamInfo':
         """Extract stream info using native ffprobe json."""
         try:
             result = subprocess.run(
                 [
-                    str(config.ffprobe_path),
+                    ffprobe_path,
+                    *(("-probesize", FAST_PROBE_SIZE, "-analyzeduration", FAST_PROBE_DURATION, "-threads", "1") if fast_probe else ()),
                     "-v",
                     "error",
                     "-select_streams",
                     "v:0",
                     "-show_entries",
-                    "stream=codec_name,profile,width,height,pix_fmt:stream_side_data=red_x,red_y,green_x,green_y,blue_x,blue_y,white_point_x,white_point_y,min_luminance,max_luminance,max_content,max_average",
+                    "stream=codec_name,profile,width,height,pix_fmt,bit_rate:stream_side_data=red_x,red_y,green_x,green_y,blue_x,blue_y,white_point_x,white_point_y,min_luminance,max_luminance,max_content,max_average:format=bit_rate",
                     "-of",
                     "json",
                     str(filepath),
@@ -56,6 +91,7 @@ class VideoStreamInfo:
                 capture_output=True,
                 text=True,
                 check=True,
+                timeout=timeout,
             )
             
             probe_data = json.loads(result.stdout)
@@ -74,6 +110,10 @@ class VideoStreamInfo:
 
             if width is None or height is None:
                 raise MediaValidationError(f"Missing width/height in {filepath}")
+
+            # MKV rarely carries a per-stream bitrate; fall back to the container's overall bitrate
+            bit_rate = track.get("bit_rate") or probe_data.get("format", {}).get("bit_rate") or "0"
+            bit_rate = int(bit_rate) if str(bit_rate).isdigit() else 0
                 
             master_display = ""
             max_cll = ""
@@ -104,13 +144,75 @@ class VideoStreamInfo:
                 profile=str(profile).lower(),
                 pix_fmt=str(pix_fmt).lower(),
                 master_display=master_display,
-                max_cll=max_cll
+                max_cll=max_cll,
+                bit_rate=bit_rate
             )
-        except Exception as e:
-            if isinstance(e, MediaValidationError):
-                raise
+        except subprocess.TimeoutExpired:
+            raise MediaValidationError(f"ffprobe timeout after {timeout}s: {filepath}")
+        except (subprocess.CalledProcessError, json.JSONDecodeError, OSError, KeyError, ValueError, TypeError) as e:
             raise MediaValidationError(f"Failed to parse media info: {e}")
 
+@lru_cache(maxsize=4096)
+def _probe_cached(path_str: str, mtime_ns: int, size: int, ffprobe_path: str, fast_probe: bool,
+                  timeout: Optional[float]) -> VideoStreamInfo:
+    # mtime_ns and size are part of the key only, so a rewritten file is probed again
+    return VideoStreamInfo.probe(Path(path_str), ffprobe_path, fast_probe, timeout)
+
+_probe_locks_guard = threading.Lock()
+_probe_locks: Dict[Tuple[str, int, int], threading.Lock] = {}
+
+def _cached_stream_info(path_str: str, mtime_ns: int, size: int, ffprobe_path: str, fast_probe: bool,
+                        timeout: Optional[float] = None) -> VideoStreamInfo:
+    """lru_cache does not dedupe concurrent misses; a per-file lock collapses them into one probe."""
+    key = (path_str, mtime_ns, size)
+    with _probe_locks_guard:
+        lock = _probe_locks.setdefault(key, threading.Lock())
+    try:
+        with lock:
+            return _probe_cached(path_str, mtime_ns, size, ffprobe_path, fast_probe, timeout)
+    finally:
+        with _probe_locks_guard:
+            _probe_locks.pop(key, None)
+
+def probe_streams(filepath: Path, config: AppConfig) -> Tuple[dict, ...]:
+    """
+    Every stream of filepath (index, codec_type, codec_name, channels, language tag) from one ffprobe
+    run shared by the subtitle and audio track lookups. Cached while the file's mtime and size are
+    unchanged, so the returned dicts must not be mutated.
+    """
+    try:
+        st = filepath.stat()
+    except OSError:
+        # Nothing to key a cache entry on; let ffprobe report the problem
+        return _run_stream_probe(str(filepath), config.ffprobe_path_s, config.ffprobe_timeout_sec)
+    return _probe_streams_cached(str(filepath), st.st_mtime_ns, st.st_size, config.ffprobe_path_s,
+                                 config.ffprobe_timeout_sec)
+
+@lru_cache(maxsize=256)
+def _probe_streams_cached(path_str: str, mtime_ns: int, size: int, ffprobe_path: str,
+                          timeout: Optional[float]) -> Tuple[dict, ...]:
+    # mtime_ns and size are part of the key only, so a rewritten file is probed again
+    return _run_stream_probe(path_str, ffprobe_path, timeout)
+
+def _run_stream_probe(path_str: str, ffprobe_path: str, timeout: Optional[float]) -> Tuple[dict, ...]:
+    result = subprocess.run(
+        [
+            ffprobe_path,
+            "-v",
+            "error",
+            "-show_entries",
+            "stream=index,codec_type,codec_name,channels:stream_tags=language",
+            "-of",
+            "json",
+            path_str,
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+        timeout=timeout,
+    )
+    return tuple(json.loads(result.stdout).get("streams", []))
+
 class MediaType(Enum):
     """Enumeration of processable media entity types."""
     MOVIE = auto()
@@ -124,12 +226,13 @@ class JobStatus(str, Enum):
     FAILED = "FAILED"
     REJECTED = "REJECTED"
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class EncodingTier:
     bf: int
     lad: int
     async_depth: int
     desc: str
+    hyper: bool = False
 
 @dataclass
 class JobContext:
@@ -139,19 +242,51 @@ class JobContext:
     strategy: 'EncoderStrategy'
     job_id: int
     shutdown_event: Optional['threading.Event'] = None
+    ffmpeg_log_path: Optional[Path] = None
 
 
 class MediaItem(ABC):
     """Abstract base class for all processable media."""
-    def __init__(self, source_path: Path, config: AppConfig, original_job_path: Optional[Path] = None):
+    def __init__(self, source_path: Path, config: AppConfig, original_job_path: Optional[Path] = None,
+                 stat_result: Optional[os.stat_result] = None, probe: bool = True,
+                 db: Optional['DatabaseManager'] = None):
         self.source_path = source_path
         self.config = config
         self.original_job_path = original_job_path or source_path
-        self.stream_info: Optional[VideoStreamInfo] = None
+        self.db = db
+        self._stat_result = stat_result
+        self._stream_info: Optional[VideoStreamInfo] = None
+        self._stream_info_loaded = False
         
-        # Load stream info immediately to validate
-        if self.source_path.is_file():
-             self.stream_info = VideoStreamInfo.from_file(self.source_path, self.config)
+        if probe:
+            # Load stream info immediately to validate; with probe=False it is loaded on first access
+            self.prefetch_stream_info()
+
+    @property
+    def stream_info(self) -> Optional[VideoStreamInfo]:
+        if not self._stream_info_loaded:
+            self.prefetch_stream_info()
+        return self._stream_info
+
+    @stream_info.setter
+    def stream_info(self, value: Optional[VideoStreamInfo]) -> None:
+        self._stream_info = value
+        self._stream_info_loaded = True
+        self._stat_result = None
+
+    def prefetch_stream_info(self) -> Optional[VideoStreamInfo]:
+        """Probe the source now. A caller-supplied stat saves the is_file/stat syscalls."""
+        st = self._stat_result
+        is_file = stat.S_ISREG(st.st_mode) if st is not None else self.source_path.is_file()
+        self.stream_info = VideoStreamInfo.from_file(self.source_path, self.config, st, self.db) if is_file else None
+        return self._stream_info
+
+    @classmethod
+    @abstractmethod
+    def from_directory(cls, directory: Path, config: AppConfig,
+                       db: Optional['DatabaseManager'] = None) -> List['MediaItem']:
+        """Builds the items for a job that points at a directory rather than a single file."""
+        pass
 
     @abstractmethod
     def target_directory(self) -> Path:
@@ -177,6 +312,15 @@ class MediaItem(ABC):
 class Movie(MediaItem):
     """Represents a discrete Movie entity."""
     
+    @classmethod
+    def from_directory(cls, directory: Path, config: AppConfig,
+                       db: Optional['DatabaseManager'] = None) -> List['MediaItem']:
+        """A movie directory yields its largest video file."""
+        actual_file = get_largest_movie_file(directory)
+        if not actual_file:
+            raise ValueError(f"No valid video file found in directory: {directory}")
+        return [cls(source_path=actual_file, config=config, original_job_path=directory, db=db)]
+
     def target_directory(self) -> Path:
         return self.config.target_movies_dir
         
@@ -228,6 +372,15 @@ class Movie(MediaItem):
 class TVEpisode(MediaItem):
     """Represents a discrete TV Episode entity."""
     
+    @classmethod
+    def from_directory(cls, directory: Path, config: AppConfig,
+                       db: Optional['DatabaseManager'] = None) -> List['MediaItem']:
+        """A season directory yields every episode in it, probed concurrently."""
+        episodes = sorted(walk_media_files(directory))
+        items = [cls(source_path=ep, config=config, original_job_path=directory, probe=False, db=db) for ep in episodes]
+        MediaFactory.probe_all(items)
+        return items
+
     def target_directory(self) -> Path:
         return self.config.target_tvseries_dir
         
@@ -287,22 +440,55 @@ class TVEpisode(MediaItem):
 class MediaFactory:
     """Factory for producing appropriate MediaItem domain models based on MediaType."""
     @staticmethod
-    def create(media_type: MediaType, source_path: Path, config: AppConfig) -> list['MediaItem']:
-        if media_type == MediaType.MOVIE:
-            if source_path.is_dir():
-                actual_file = get_largest_movie_file(source_path)
-                if not actual_file:
-                    raise ValueError(f"No valid video file found in directory: {source_path}")
-                return [Movie(source_path=actual_file, config=config, original_job_path=source_path)]
-            return [Movie(source_path=source_path, config=config, original_job_path=source_path)]
-        elif media_type == MediaType.TVSERIES:
-            if source_path.is_dir():
-                episodes = []
-                for ext in ('.mkv', '.mp4', '.avi', '.m4v', '.MKV', '.MP4', '.AVI', '.M4V'):
-                    episodes.extend(source_path.rglob(f"*{ext}"))
-                episodes.sort()
-                return [TVEpisode(source_path=ep, config=config, original_job_path=source_path) for ep in episodes]
-            return [TVEpisode(source_path=source_path, config=config, original_job_path=source_path)]
-        else:
+    def classify(abs_path: Path, config: AppConfig) -> MediaType:
+        """Route an absolute job path to its MediaType using the precomputed root prefixes."""
+        path_str = str(abs_path)
+        if path_str.startswith(config.movies_root_prefix):
+            return MediaType.MOVIE
+        if path_str.startswith(config.tvseries_root_prefix):
+            return MediaType.TVSERIES
+        return MediaType.UNKNOWN
+
+    @staticmethod
+    def create(media_type: MediaType, source_path: Path, config: AppConfig,
+               stat_result: Optional[os.stat_result] = None, db: Optional['DatabaseManager'] = None) -> list['MediaItem']:
+        item_cls = _MEDIA_ITEM_CLASSES.get(media_type)
+        if item_cls is None:
             logger.error(f"Cannot instantiate MediaItem for UNKNOWN media type at {source_path}")
             return []
+
+        is_dir = stat.S_ISDIR(stat_result.st_mode) if stat_result is not None else source_path.is_dir()
+        if not is_dir:
+            return [item_cls(source_path=source_path, config=config, original_job_path=source_path, stat_result=stat_result, db=db)]
+        return item_cls.from_directory(source_path, config, db)
+
+    @staticmethod
+    def probe_all(items: List['MediaItem']) -> None:
+        """
+        Prefetch stream info for items built with probe=False, probing concurrently.
+        Each probe mostly waits on an ffprobe subprocess, so threads overlap well; the pool is capped
+        so a large season cannot fork an unbounded number of ffprobe processes.
+        """
+        if not items:
+            return
+        workers = min(len(items), 32, (os.cpu_count() or 1) * 4)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="probe") as executor:
+            futures = [executor.submit(MediaFactory._probe_in_worker, item) for item in items]
+            for item, future in zip(items, futures):
+                # Re-raises the first MediaValidationError, as sequential construction did
+                item.stream_info = future.result()
+
+    @staticmethod
+    def _probe_in_worker(item: 'MediaItem') -> VideoStreamInfo:
+        """Probe on a pool thread, closing the db connection that thread opened for the stream-info cache."""
+        try:
+            return VideoStreamInfo.from_file(item.source_path, item.config, None, item.db)
+        finally:
+            if item.db is not None:
+                item.db.close()
+
+
+_MEDIA_ITEM_CLASSES = {
+    MediaType.MOVIE: Movie,
+    MediaType.TVSERIES: TVEpisode,
+}
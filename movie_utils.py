@@ -1,13 +1,53 @@
 #!/usr/bin/env python3
 import logging
+import os
 import re
-from typing import Optional
+import string
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
 from pathlib import Path
 from config import AppConfig
 from metadata_utils import search_movie_tmdb
 
 logger = logging.getLogger(__name__)
 
+# [...] and (...) groups in one pass; negated classes instead of lazy .*? avoid backtracking
+_BRACKET_RE = re.compile(r'\[[^\]]*\]|\([^)]*\)')
+_YEAR_RE = re.compile(r'(19|20)\d{2}')
+_RES_RE = re.compile(r'((?:1080|720|2160)p)', re.IGNORECASE)
+_FLAGS_RE = re.compile(r'((?:1080|720|2160|480|576)[pi]|4k|blu-?ray|web-?dl|web-?rip|hdtv|flac|aac|x264|x265|hevc|avc|divx|xvid)', re.IGNORECASE)
+_SEP_RE = re.compile(r'[\._]')
+_TITLE_UNSAFE_RE = re.compile(r'[^a-zA-Z0-9 ]+')
+_NAME_SAFE_CHARS = frozenset(string.ascii_letters + string.digits)
+_MOVIE_EXTENSIONS = frozenset({'.mkv', '.mp4', '.avi', '.mov'})
+# Broad list of video extensions stripped before building the TMDB query
+_STRIP_EXTENSIONS = frozenset({'.mkv', '.mp4', '.avi', '.mov', '.m4v', '.divx', '.xvid', '.wmv'})
+# unlink releases the GIL; keep the fan-out bounded so a junk-heavy folder cannot swamp the NAS
+_UNLINK_WORKERS = 8
+
+
+def _slugify(text: str) -> str:
+    """Collapse every run of characters outside [A-Za-z0-9] into one '.', dropping trailing dots."""
+    out = []
+    prev_dot = False
+    for ch in text:
+        if ch in _NAME_SAFE_CHARS:
+            out.append(ch)
+            prev_dot = False
+        elif not prev_dot:
+            out.append('.')
+            prev_dot = True
+    return ''.join(out).rstrip('.')
+
+
+def _safe_unlink(entry: os.DirEntry) -> Tuple[str, Optional[Exception]]:
+    try:
+        os.unlink(entry.path)
+        return entry.name, None
+    except Exception as e:
+        return entry.name, e
+
+
 def cleanup_movie_directory(directory: Path, config: AppConfig) -> None:
     """
     Clean up movie directory after conversion.
@@ -25,24 +65,32 @@ def cleanup_movie_directory(directory: Path, config: AppConfig) -> None:
 
     deleted_count = 0
     kept_count = 0
+    to_delete = []
+    valid_extensions = config.valid_extensions
 
     try:
-        for item in directory.iterdir():
-            if not item.is_file():
-                continue
-                
-            if item.suffix.lower() in config.valid_extensions:
-                logger.info(f"KEEPING: {item.name}")
-                kept_count += 1
-            else:
-                logger.info(f"DELETING: {item.name}")
-                try:
-                    item.unlink()
-                    deleted_count += 1
-                except Exception as e:
-                    logger.warning(f"Failed to delete {item.name}: {e}", exc_info=True)
+        # DirEntry.is_file() answers from d_type, so no stat per item
+        with os.scandir(directory) as it:
+            for item in it:
+                if not item.is_file():
+                    continue
+                    
+                if os.path.splitext(item.name)[1].lower() in valid_extensions:
+                    logger.debug("KEEPING: %s", item.name)
+                    kept_count += 1
+                else:
+                    logger.debug("DELETING: %s", item.name)
+                    to_delete.append(item)
 
-        logger.info(f"CLEANUP_COMPLETE: Kept {kept_count} files, deleted {deleted_count} files")
+        if to_delete:
+            with ThreadPoolExecutor(max_workers=min(len(to_delete), _UNLINK_WORKERS)) as executor:
+                for name, error in executor.map(_safe_unlink, to_delete):
+                    if error is None:
+                        deleted_count += 1
+                    else:
+                        logger.warning("Failed to delete %s: %s", name, error, exc_info=error)
+
+        logger.info("CLEANUP_COMPLETE: Kept %d files, deleted %d files", kept_count, deleted_count)
 
     except Exception as e:
         logger.exception(f"ERROR during cleanup: {e}")
@@ -69,24 +117,18 @@ def sanitize_movie_name(filename: str, config: AppConfig) -> str:
     # --- STRATEGY 1: TMDB Lookup ---
     
     # 0. Strip known file extensions to prevent "Movie.mkv" becoming "Movie mkv" query
-    stem = filename
-    # Broad list of video extensions to strip
-    extensions_to_strip = {'.mkv', '.mp4', '.avi', '.mov', '.m4v', '.divx', '.xvid', '.wmv'}
-    for ext in extensions_to_strip:
-        if filename.lower().endswith(ext):
-            stem = filename[:-len(ext)]
-            break
+    dot = filename.rfind('.')
+    stem = filename[:dot] if dot != -1 and filename[dot:].lower() in _STRIP_EXTENSIONS else filename
             
     # 1. Remove content in brackets [] and ()
-    clean_stem = re.sub(r'\[.*?\]', '', stem)
-    clean_stem = re.sub(r'\(.*?\)', '', clean_stem)
+    clean_stem = _BRACKET_RE.sub('', stem)
     
     # 2. Extract Year and Resolution to define the query
     query_year = None
     query_candidate = clean_stem
 
     # Try to find year
-    year_match = re.search(r'(19|20)\d{2}', clean_stem)
+    year_match = _YEAR_RE.search(clean_stem)
     if year_match:
         query_year = year_match.group(0)
         # Use text BEFORE the year as the title query
@@ -100,13 +142,13 @@ def sanitize_movie_name(filename: str, config: AppConfig) -> str:
              pass 
     else:
         # No year, look for resolution to truncate
-        res_match = re.search(r'((?:1080|720|2160)p)', clean_stem, re.IGNORECASE)
+        res_match = _RES_RE.search(clean_stem)
         if res_match:
              query_candidate = clean_stem[:res_match.start()]
 
     # Final cleanup
     # Replace dots and underscores with spaces
-    query_candidate = re.sub(r'[\._]', ' ', query_candidate).strip()
+    query_candidate = _SEP_RE.sub(' ', query_candidate).strip()
     
     if query_candidate:
         logger.info(f"Querying TMDB: '{query_candidate}' (Year: {query_year})")
@@ -114,7 +156,7 @@ def sanitize_movie_name(filename: str, config: AppConfig) -> str:
         
         if tmdb_result:
             title, year_found = tmdb_result
-            safe_title = re.sub(r'[^a-zA-Z0-9 ]+', '', title).replace(' ', '.')
+            safe_title = _TITLE_UNSAFE_RE.sub('', title).replace(' ', '.')
             if year_found:
                 logger.info(f"TMDB Success: {safe_title}.{year_found}")
                 return f"{safe_title}.{year_found}"
@@ -125,30 +167,24 @@ def sanitize_movie_name(filename: str, config: AppConfig) -> str:
              logger.info("TMDB did not return a valid result. Falling back to regex.")
 
     # --- STRATEGY 2: Fallback Regex ---
-    # 1. Try finding a year first
-    year_match = re.search(r'(19|20)\d{2}', filename)
+    # 1. Try finding a year first. Without bracket/paren removal clean_stem is a prefix of filename
+    #    (minus a digit-free extension), so the strategy 1 match is already the answer.
+    if clean_stem != stem:
+        year_match = _YEAR_RE.search(filename)
     if year_match:
         year = year_match.group(0)
         prefix = filename[:year_match.start()]
-        prefix = re.sub(r'[._-]+$', '', prefix)
-        prefix = re.sub(r'\.+', '.', prefix)
-        prefix = re.sub(r'[^a-zA-Z0-9.]+', '.', prefix)
-        prefix = prefix.rstrip('.')
-        result = f"{prefix}.{year}"
+        result = f"{_slugify(prefix)}.{year}"
     else:
         # 2. If no year, look for resolution/quality tags to stop at
-        flags_pattern = r'((?:1080|720|2160|480|576)[pi]|4k|blu-?ray|web-?dl|web-?rip|hdtv|flac|aac|x264|x265|hevc|avc|divx|xvid)'
-        
-        split_match = re.search(flags_pattern, filename, re.IGNORECASE)
+        split_match = _FLAGS_RE.search(filename)
         
         if split_match:
              prefix = filename[:split_match.start()]
         else:
              prefix = filename
 
-        result = re.sub(r'[^a-zA-Z0-9.]+', '.', prefix)
-        result = re.sub(r'\.+', '.', result)
-        result = result.rstrip('.')
+        result = _slugify(prefix)
     
     return result
 
@@ -168,15 +204,16 @@ def get_largest_movie_file(folder: Path) -> Optional[Path]:
         logger.info(f"File path detected, returning: {folder.name}")
         return folder
     
-    movie_files = (list(folder.glob("*.mkv")) + list(folder.glob("*.mp4")) +
-                   list(folder.glob("*.avi")) + list(folder.glob("*.mov")))
+    # Single readdir pass; DirEntry caches the file type so only one stat per candidate
+    with os.scandir(folder) as it:
+        movie_files = [(entry.stat().st_size, entry.path) for entry in it
+                       if os.path.splitext(entry.name)[1].lower() in _MOVIE_EXTENSIONS and entry.is_file()]
     
     if not movie_files:
         logger.warning(f"No movie files found in {folder}")
         return None
     
-    # Sort by file size (largest first)
-    largest_file = max(movie_files, key=lambda f: f.stat().st_size)
+    largest_file = Path(max(movie_files)[1])
     logger.info(f"Found {len(movie_files)} movie file(s), selected largest: {largest_file.name}")
     
     return largest_file
\ No newline at end of file
@@ -5,11 +5,16 @@ import subprocess
 import json
 import re
 from charset_normalizer import from_bytes
-import glob
-from langdetect import detect, LangDetectException
+import os
+import shutil
+import tempfile
+from functools import lru_cache
+from langdetect import DetectorFactory, LangDetectException
+from langdetect.detector_factory import PROFILES_DIRECTORY
 from typing import Tuple, Optional
 from config import AppConfig
 from file_utils import linux_mv
+from models import probe_streams
 import threading
 
 
@@ -29,6 +34,38 @@ CODEC_MAP = {
     "text": "txt",
 }
 
+# langdetect profiles to load: the languages we label plus the ones Romanian is usually confused
+# with. Loading all 55 bundled profiles costs ~1.5 s and ~60 MB; this subset ~0.2 s and ~13 MB.
+DETECT_LANGUAGES = ("ro", "en", "fr", "es", "it", "pt", "ca", "de", "nl", "hu", "pl")
+_detector_factory: Optional[DetectorFactory] = None
+_detector_factory_lock = threading.Lock()
+
+# Subtitle markup stripped before language detection, in one pass: SRT timecodes, cue numbers,
+# HTML tags and {...} override blocks (common in .ass files)
+_MARKUP_RE = re.compile(
+    r'\d{1,2}:\d{2}:\d{2}[,.]\d{3}\s-->\s\d{1,2}:\d{2}:\d{2}[,.]\d{3}'
+    r'|^\d+\s*$'
+    r'|<[^>]+>'
+    r'|\{[^}]+\}',
+    re.MULTILINE
+)
+# Only the first 2000 cleaned characters reach langdetect; 16K raw leaves room for stripped markup
+_LANG_READ_LIMIT = 16384
+_CHARSET_SAMPLE_BYTES = 32768
+_BOM_NUL_TABLE = {0x00: None, 0xFEFF: None}
+_LATIN_RE = re.compile(r'[a-zA-Z\u00C0-\u00FF]')
+
+# Trigrams that are near-exclusive to Romanian (diacritics, both cedilla and comma-below forms).
+# Enough hits settle 'ro' without langdetect; every other language falls through to it.
+_RO_TRIGRAMS = frozenset((
+    " și", "și ", " şi", "şi ", "ție", "ţie", "ția", "ţia", "ăți", "ăţi", "ști", "şti", "ște", "şte",
+    "ță ", "ţă ", " să", "să ", " că", "că ", "ă s", "ă d", "ă p", "ă c", "ă m", "ă n", "ă f", "ăm ",
+    "ări", "ăru", "tă ", "lă ", " mă", "mă ", "nă ", "ră ", "dă ", "ână", "ând", "ânt", " în", "în ",
+    "îmi", "îți", "îţi", "ât ", "cât", "ăsc", "ăst", "ăla", "ăia", "așa", "aşa", "ață", "aţă", "ați",
+    "aţi", "eți", "eţi", "iți", "iţi", "uți", "uţi", "oți", "oţi",
+))
+_TRIGRAM_MIN_HITS = 5
+
 LANG_MAP = {
     "rum": "ro",
     "ro": "ro",
@@ -40,44 +77,20 @@ LANG_MAP = {
 
 def get_track(movie_file: Path, config: AppConfig) -> Tuple[Optional[int], Optional[str], Optional[str]]:
     try:
-        result = subprocess.run(
-            [
-                str(config.ffprobe_path),
-                "-v",
-                "error",
-                "-select_streams",
-                "s",
-                "-show_entries",
-                "stream=index,codec_name:stream_tags=language",
-                "-of",
-                "json",
-                str(movie_file),
-            ],
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-
-        probe_data = json.loads(result.stdout)
-        subtitle_tracks = probe_data.get("streams", [])
-
-        # Priority resolution
-        for track in subtitle_tracks:
+        # Single pass: return the first Romanian track, otherwise the first English one seen
+        fallback = None
+        for track in probe_streams(movie_file, config):
+            if track.get("codec_type") != "subtitle":
+                continue
             lang_tag = track.get("tags", {}).get("language", "").lower()
             mapped_lang = LANG_MAP.get(lang_tag)
             
             if mapped_lang == "ro":
                 return track["index"], track.get("codec_name", "").lower(), "ro"
+            if mapped_lang == "en" and fallback is None:
+                fallback = (track["index"], track.get("codec_name", "").lower(), "en")
 
-        # Fallback resolution
-        for track in subtitle_tracks:
-            lang_tag = track.get("tags", {}).get("language", "").lower()
-            mapped_lang = LANG_MAP.get(lang_tag)
-            
-            if mapped_lang == "en":
-                return track["index"], track.get("codec_name", "").lower(), "en"
-
-        return None, None, None
+        return fallback or (None, None, None)
 
     except subprocess.CalledProcessError as e:
         logger.error(f"FFPROBE_ERROR: {e.stderr if e.stderr else e}")
@@ -124,11 +137,12 @@ def ffmpeg_extract_subtitle(movie_file: Path, movie_name: str, folder: Path, tra
                 str(subtitle_path),
             ]
             subprocess.run(
-                [str(config.ffmpeg_path)] + args,
-                capture_output=True,
-                text=True,
+                [config.ffmpeg_path_s] + args,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
                 stdin=subprocess.DEVNULL,
                 check=True,
+                close_fds=False,
             )
         else:
             if movie_file.suffix.lower() != '.mkv':
@@ -138,10 +152,12 @@ def ffmpeg_extract_subtitle(movie_file: Path, movie_name: str, folder: Path, tra
             # Use mkvextract for MKV containers (preserves codec)
             args = ["tracks", str(movie_file), f"{track_id}:{subtitle_path}"]
             subprocess.run(
-                [str(config.mkvextract_path)] + args,
-                capture_output=True,
-                text=True,
+                [config.mkvextract_path_s] + args,
+                # mkvextract reports errors on stdout, so fold both streams into one pipe.
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
                 check=True,
+                close_fds=False,
             )
 
         if subtitle_path.exists():
@@ -152,7 +168,9 @@ def ffmpeg_extract_subtitle(movie_file: Path, movie_name: str, folder: Path, tra
         return None
 
     except subprocess.CalledProcessError as e:
-        logger.error(f"EXTRACTION_ERROR: {e.stderr if e.stderr else e}")
+        # Tool output is captured as raw bytes; only decode it when there is an error to report.
+        details = e.stderr or e.output
+        logger.error(f"EXTRACTION_ERROR: {details.decode('utf-8', 'replace') if details else e}")
         return None
     except (FileNotFoundError, PermissionError) as e:
         # These are likely permanent failures
@@ -162,7 +180,7 @@ def ffmpeg_extract_subtitle(movie_file: Path, movie_name: str, folder: Path, tra
         logger.exception(f"UNEXPECTED_ERROR extracting subtitle: {e}")
         return None
 
-def extract_subtitle(movie_file: Path, movie_name: str, output_dir: Path, config: AppConfig, shutdown_event: Optional[threading.Event] = None) -> Tuple[Optional[Path], Optional[str], Optional[str]]:
+def extract_subtitle(movie_file: Path, movie_name: str, output_dir: Path, config: AppConfig) -> Tuple[Optional[Path], Optional[str], Optional[str]]:
     track_id, codec, language = get_track(movie_file, config)
 
     if track_id is None or codec is None or language is None:
@@ -175,17 +193,14 @@ def extract_subtitle(movie_file: Path, movie_name: str, output_dir: Path, config
         return None, None, None
 
     subtitle_file, extension = result
-    
-    if shutdown_event:
-        shutdown_event.wait(0.5)
-    else:
-        threading.Event().wait(0.5)
 
-    if not subtitle_file.exists():
+    # ffmpeg/mkvextract ran to completion synchronously, so the file is final; no settle delay needed.
+    try:
+        file_size = subtitle_file.stat().st_size
+    except OSError:
         logger.warning(f"Extracted subtitle file does not exist: {subtitle_file}")
         return None, None, None
 
-    file_size = subtitle_file.stat().st_size
     if file_size == 0:
         logger.warning(f"Extracted subtitle file is empty: {subtitle_file}")
         return None, None, None
@@ -198,6 +213,8 @@ def detect_and_convert_encoding(file_path: Path) -> Optional[str]:
     with open(file_path, 'rb') as f:
         raw_data = f.read()
 
+    plain_utf8 = False
+
     # 1. Fast path: Check for Byte Order Mark (BOM)
     if raw_data.startswith(b'\xef\xbb\xbf'):
         logger.info("Detected UTF-8 BOM")
@@ -212,6 +229,7 @@ def detect_and_convert_encoding(file_path: Path) -> Optional[str]:
         # 2. Try strict UTF-8 (most common for modern files)
         try:
             content = raw_data.decode('utf-8')
+            plain_utf8 = True
             logger.info("Detected UTF-8 (No BOM)")
             # Sanity check: if it decodes as UTF-8 but has A LOT of nulls, it might be UTF-16 without BOM
             # But strict UTF-8 usually fails often on random binary.
@@ -220,15 +238,18 @@ def detect_and_convert_encoding(file_path: Path) -> Optional[str]:
 
     # 3. Use charset_normalizer for intelligent detection if strict UTF-8 failed
     if content is None:
-        results = from_bytes(raw_data)
-        best_match = results.best()
+        # Its mess scoring is O(N) in pure Python: detect on a sample, then decode the whole file
+        sample = raw_data[:_CHARSET_SAMPLE_BYTES]
+        best_match = from_bytes(sample).best()
+        if best_match is None and len(raw_data) > len(sample):
+            best_match = from_bytes(raw_data).best()
         
         if best_match:
             detected_encoding = best_match.encoding
             logger.info(f"Charset Normalizer analysis: {detected_encoding}")
             try:
-                content = str(best_match)
-            except UnicodeDecodeError:
+                content = raw_data.decode(detected_encoding)
+            except (UnicodeDecodeError, LookupError):
                 logger.warning(f"Charset Normalizer detected {detected_encoding} but decode failed.")
                 pass
 
@@ -248,17 +269,20 @@ def detect_and_convert_encoding(file_path: Path) -> Optional[str]:
         logger.warning("All encoding attempts failed. Forcing latin-1 with replacement.")
         content = raw_data.decode('latin-1', errors='replace')
 
-    # Cleanup: Remove BOM and null bytes if they persist
-    if content.startswith('\ufeff'):
-        content = content.replace('\ufeff', '')
-    
-    # Text file shouldn't have null bytes usually, but some bad encodings might leave them
-    if '\x00' in content:
-         logger.warning("Null bytes found in text content, removing them.")
-         content = content.replace('\x00', '')
+    decoded = content
+
+    # Cleanup: Remove BOMs (UTF-16 decodes keep them) and null bytes left by bad encodings, in one pass
+    content = content.translate(_BOM_NUL_TABLE)
+    if len(content) != len(decoded):
+        logger.info(f"Removed {len(decoded) - len(content)} BOM/null characters from text content")
 
     content = content.strip()
 
+    # A BOM-less UTF-8 file that cleanup and strip() left unchanged is already normalized
+    if plain_utf8 and content == decoded:
+        logger.info("Subtitle already normalized UTF-8, leaving file untouched")
+        return content
+
     # Write back as standard UTF-8
     with open(file_path, 'w', encoding='utf-8') as f:
         f.write(content)
@@ -266,89 +290,132 @@ def detect_and_convert_encoding(file_path: Path) -> Optional[str]:
     return content
 
 def character_replace(src_file: Path, dst_file: Path, config: AppConfig) -> None:
+    """
+    Apply config.replace_rules line by line, so peak memory is one line rather than the file.
+    Output goes to a sibling temp file that is os.replace'd over dst_file, so a failed read never
+    truncates an existing destination, and in-place calls (src_file == dst_file) are safe.
+    """
+    tmp_path = None
     try:
-        with open(src_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-
+        fd, tmp_path = tempfile.mkstemp(dir=dst_file.parent, prefix=f".{dst_file.name}.")
+        multi_re = config.replace_multi_re
+        drop_table = dict.fromkeys(config.replace_table)
         total_replacements = 0
-
-        for find, repl in config.replace_rules:
-            count = content.count(find)
-            if count > 0:
-                content = content.replace(find, repl)
-                total_replacements += count
-                logger.info("REPLACED: '%s' -> '%s': %d", find, repl, count)
-
-        with open(dst_file, 'w', encoding='utf-8') as f:
-            f.write(content)
+        with open(fd, 'w', encoding='utf-8') as out, open(src_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                # Multi-character rules first, so the char -> char pass cannot break up their sequences
+                if multi_re is not None:
+                    line, count = multi_re.subn(lambda m: config.replace_multi_map[m.group(0)], line)
+                    total_replacements += count
+                # Count by deleting the rule characters instead of a per-char compare
+                total_replacements += len(line) - len(line.translate(drop_table))
+                out.write(line.translate(config.replace_table))
+
+        # mkstemp creates the file 0600; give the result the source's permissions
+        shutil.copymode(src_file, tmp_path)
+        os.replace(tmp_path, dst_file)
+        tmp_path = None
             
         logger.info(f"Made {total_replacements} replacements in {dst_file}")
 
     except Exception:
         logger.exception("ERROR_in_clean_subtitle_file")
         raise
+    finally:
+        if tmp_path is not None:
+            Path(tmp_path).unlink(missing_ok=True)
+
+def _detect_language(text: str) -> str:
+    """langdetect.detect() restricted to DETECT_LANGUAGES, loading those profiles on first use."""
+    global _detector_factory
+    with _detector_factory_lock:
+        if _detector_factory is None:
+            factory = DetectorFactory()
+            profiles_dir = Path(PROFILES_DIRECTORY)
+            factory.load_json_profile([(profiles_dir / lang).read_text(encoding='utf-8') for lang in DETECT_LANGUAGES])
+            _detector_factory = factory
+    detector = _detector_factory.create()
+    detector.append(text)
+    return detector.detect()
+
+def _trigram_is_ro(text: str) -> Optional[str]:
+    """Return 'ro' when enough Romanian-only trigrams show up, else None so langdetect decides."""
+    sample = ' '.join(text.lower().split())
+    ro_hits = 0
+    for i in range(len(sample) - 2):
+        if sample[i:i + 3] in _RO_TRIGRAMS:
+            ro_hits += 1
+            if ro_hits >= _TRIGRAM_MIN_HITS:
+                return 'ro'
+    return None
 
 def get_language(subtitle_path: str | Path) -> str:
     """
-    Detect language of a subtitle file using langdetect.
+    Detect language of a subtitle file: filename tag, then a Romanian trigram check, then langdetect.
     Returns 'unknown' if detection fails or text is too short.
     """
     path = Path(subtitle_path)
     
     # 1. Check filename for language code (e.g. movie.en.srt)
-    # path.stem for 'movie.en.srt' is 'movie.en' -> split giving ['movie', 'en']
-    parts = path.stem.split('.')
-    if len(parts) > 0:
-        potential_lang = parts[-1].lower()
-        
-        if potential_lang in ['ro', 'rum', 'rom']:
-            logger.info(f"Language detected from filename: {potential_lang} -> ro")
-            return 'ro'
-            
-        if potential_lang in ['en', 'eng', 'english']:
-            logger.info(f"Language detected from filename: {potential_lang} -> en")
-            return 'en'
+    # path.stem for 'movie.en.srt' is 'movie.en' -> last dotted part is 'en'
+    potential_lang = path.stem.rpartition('.')[2].lower()
+    if potential_lang in ('ro', 'rum', 'rom'):
+        logger.info(f"Language detected from filename: {potential_lang} -> ro")
+        return 'ro'
+
+    if potential_lang in ('en', 'eng', 'english'):
+        logger.info(f"Language detected from filename: {potential_lang} -> en")
+        return 'en'
 
-    if not path.exists():
+    try:
+        st = path.stat()
+    except OSError:
         logger.error(f"Subtitle file not found for language detection: {path}")
         return "error_file_not_found"
 
+    try:
+        return _detect_file_language(str(path), st.st_mtime_ns, st.st_size)
+    except Exception:
+        # Raised out of the cached helper, so a transient failure is retried on the next call
+        logger.exception(f"Error detecting language for {path.name}")
+        return "error_detecting_language"
+
+@lru_cache(maxsize=1024)
+def _detect_file_language(path_str: str, mtime_ns: int, size: int) -> str:
+    """
+    Content-based detection for get_language; mtime_ns and size only key the cache.
+    Only detection results are cached: read and other unexpected errors propagate to get_language.
+    """
+    path = Path(path_str)
     try:
         try:
             with open(path, 'r', encoding='utf-8-sig') as f:
-                content = f.read()
+                content = f.read(_LANG_READ_LIMIT)
         except UnicodeDecodeError:
             # Fallback: Detect encoding for legacy files (Windows-1252, Shift-JIS, etc.)
             logger.warning(f"UTF-8 decode failed for {path.name}, attempting auto-detection")
             with open(path, 'rb') as f:
-                raw_data = f.read()
+                raw_data = f.read(_LANG_READ_LIMIT)
                 best_match = from_bytes(raw_data).best()
                 encoding = best_match.encoding if best_match else 'utf-8'
                 logger.info(f"Auto-detected encoding: {encoding}")
                 content = str(best_match) if best_match else raw_data.decode('utf-8', errors='replace')
 
         # Clean up text for better detection
-        content = re.sub(r'\d{1,2}:\d{2}:\d{2}[,.]\d{3}\s-->\s\d{1,2}:\d{2}:\d{2}[,.]\d{3}', ' ', content)
-        content = re.sub(r'^\d+\s*$', '', content, flags=re.MULTILINE)
-        content = re.sub(r'<[^>]+>', ' ', content)
-        content = re.sub(r'\{[^}]+\}', ' ', content) # Common in .ass files
-        clean_text = content.strip()
+        clean_text = _MARKUP_RE.sub(' ', content).strip()
 
-        if len(clean_text) < 10 or not re.search(r'[a-zA-Z\u00C0-\u00FF]', clean_text):
+        if len(clean_text) < 10 or not _LATIN_RE.search(clean_text):
             logger.warning(f"Text too short or invalid for language detection in {path.name}")
             return "unknown"
         
         sample_text = clean_text[:2000] 
-        lang = detect(sample_text)
+        lang = _trigram_is_ro(sample_text) or _detect_language(sample_text)
         logger.info(f"Detected language for {path.name}: {lang}")
         return lang
 
     except LangDetectException:
         logger.warning(f"Language detection failed for {path.name}")
         return "unknown"
-    except Exception:
-        logger.exception(f"Error detecting language for {path.name}")
-        return "error_detecting_language"
 
 def get_first_subtitle_found(movie_file: Path) -> Optional[Path]:
     """
@@ -357,14 +424,24 @@ def get_first_subtitle_found(movie_file: Path) -> Optional[Path]:
     """
     extensions = ["srt", "vtt", "ass", "sub"]
     movie_stem = movie_file.stem
-    safe_stem = glob.escape(movie_stem)
-    parent_dir = movie_file.parent
+
+    # One directory scan: remember the first "<stem>*.<ext>" entry per extension, then pick by priority
+    first_by_ext = {}
+    try:
+        with os.scandir(movie_file.parent) as it:
+            for entry in it:
+                name = entry.name
+                if not name.startswith(movie_stem):
+                    continue
+                ext = name.rpartition('.')[2]
+                if ext in extensions and ext not in first_by_ext and len(name) > len(movie_stem) + len(ext):
+                    first_by_ext[ext] = entry.path
+    except OSError:
+        return None
 
     for ext in extensions:
-        # Check simple match: movie_name.srt
-        matches = list(parent_dir.glob(f"{safe_stem}*.{ext}"))
-        if matches:
-            found = matches[0]
+        if ext in first_by_ext:
+            found = Path(first_by_ext[ext])
             logger.info(f"Found external subtitle: {found.name}")
             return found
 
@@ -407,7 +484,7 @@ def find_or_extract_subtitle(movie_file: Path, movie_name: str, output_dir: Path
         
     else:
         logger.info("No external subtitle found, attempting extraction...")
-        extracted_subtitle_file, language, extension = extract_subtitle(movie_file, movie_name, output_dir, config, shutdown_event)
+        extracted_subtitle_file, language, extension = extract_subtitle(movie_file, movie_name, output_dir, config)
         
         if extracted_subtitle_file:
             logger.info(f"Using extracted embedded subtitle: {extracted_subtitle_file}")
@@ -424,7 +501,7 @@ def convert_sub_to_srt(sub_file: Path, config: AppConfig) -> Optional[Path]:
     srt_file = sub_file.with_suffix('.srt')
     
     cmd = [
-        str(config.ffmpeg_path), "-y",
+        config.ffmpeg_path_s, "-y",
         "-i", str(sub_file),
         str(srt_file)
     ]
@@ -469,8 +546,10 @@ def process_subtitle(source_path: Path, clean_name: str, config: AppConfig, shut
     # ----------------------------------------------------
 
     if language == "ro":
+        is_sub = subtitle_file.suffix.lower() == '.sub'
+
         # Check if it's a VobSub file (binary) by checking header signatures as a secondary safeguard
-        if subtitle_file.suffix.lower() == '.sub':
+        if is_sub:
             try:
                 with open(subtitle_file, 'rb') as f:
                     header = f.read(32)
@@ -492,7 +571,7 @@ def process_subtitle(source_path: Path, clean_name: str, config: AppConfig, shut
         detect_and_convert_encoding(subtitle_file)
         
         # 2. Convert .sub to .srt (MicroDVD to SubRip)
-        if subtitle_file.suffix.lower() == '.sub':
+        if is_sub:
             # Check if it's text-based MicroDVD (starts with '{')
             try:
                 with open(subtitle_file, 'r', encoding='utf-8', errors='ignore') as f:
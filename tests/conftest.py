@@ -44,6 +44,7 @@ def mock_config(tmp_path):
         target_tvseries_dir=tmp_path / "archive" / "tv-series",
         queue_file=queue_file,
         db_path=db_path,
+        tmdb_cache_path=tmp_path / "scratch" / "tmdb_cache.db",
         tmdb_read_access_token="dummy_token",
         email_smtp_username="dummy_user",
         email_smtp_password="dummy_password",
@@ -1,8 +1,9 @@
 import unittest
 from pathlib import Path
 from db_utils import DatabaseManager
-from models import JobStatus
+from models import JobStatus, VideoStreamInfo
 import sqlite3
+from contextlib import closing
 import tempfile
 import os
 
@@ -13,6 +14,7 @@ class TestDatabaseManager(unittest.TestCase):
         self.db = DatabaseManager(Path(self.temp_db.name))
         
     def tearDown(self):
+        self.db.close()
         os.unlink(self.temp_db.name)
         
     def test_add_and_dequeue_job(self):
@@ -28,6 +30,38 @@ class TestDatabaseManager(unittest.TestCase):
         job2 = self.db.dequeue_pending_job()
         self.assertIsNone(job2)
         
+    def test_dequeue_legacy_sqlite_fallback(self):
+        self.db._supports_returning = False  # Simulate SQLite < 3.35
+        self.db.add_job("/test/legacy.mkv")
+        
+        job = self.db.dequeue_pending_job()
+        self.assertIsNotNone(job)
+        self.assertEqual(job[1], "/test/legacy.mkv")
+        self.assertIsNone(self.db.dequeue_pending_job())
+        
+    def test_add_jobs_batch(self):
+        self.db.add_job("/test/ep1.mkv")
+        queued = self.db.add_jobs_batch(["/test/ep1.mkv", "/test/ep2.mkv", "/test/ep3.mkv"])
+        self.assertEqual(queued, 2)  # ep1 already queued
+        self.assertEqual(self.db.add_jobs_batch([]), 0)
+        
+        paths = set()
+        while (job := self.db.dequeue_pending_job()) is not None:
+            paths.add(job[1])
+        self.assertEqual(paths, {"/test/ep1.mkv", "/test/ep2.mkv", "/test/ep3.mkv"})
+        
+    def test_ingest_text_queue_batches_and_clears(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            queue_file = Path(tmpdir) / "conversion.txt"
+            queue_file.write_text("/test/a.mkv\n\n/test/b.mkv\n/test/a.mkv\n")
+            
+            self.db.ingest_text_queue(queue_file)
+            
+            self.assertEqual(queue_file.read_text(), "")
+            self.assertIsNotNone(self.db.dequeue_pending_job())
+            self.assertIsNotNone(self.db.dequeue_pending_job())
+            self.assertIsNone(self.db.dequeue_pending_job())
+        
     def test_update_job_status(self):
         self.db.add_job("/test/path2.mkv")
         job = self.db.dequeue_pending_job()
@@ -42,6 +76,14 @@ class TestDatabaseManager(unittest.TestCase):
             status = cursor.fetchone()[0]
             self.assertEqual(status, JobStatus.COMPLETED.value)
             
+    def test_dequeue_uses_status_index(self):
+        with sqlite3.connect(self.temp_db.name) as conn:
+            plan = conn.execute(
+                "EXPLAIN QUERY PLAN SELECT id, path FROM jobs WHERE status = ? ORDER BY created_at ASC LIMIT 1",
+                (JobStatus.PENDING.value,)
+            ).fetchall()
+        self.assertTrue(any("idx_jobs_status_created" in row[-1] for row in plan))
+        
     def test_heuristics_profiles(self):
         self.db.save_successful_profile(1920, 1080, "h264", "yuv420p", 4, 30, 4)
         
@@ -52,5 +94,30 @@ class TestDatabaseManager(unittest.TestCase):
         profile2 = self.db.get_best_profile(1280, 720, "h264", "yuv420p")
         self.assertIsNone(profile2)
 
+    def test_stream_info_cache(self):
+        info = VideoStreamInfo(width=3840, height=2160, codec_name="hevc", profile="main 10",
+                               pix_fmt="yuv420p10le", max_cll="1000,400", bit_rate=20000000)
+        self.db.save_stream_info("/test/movie.mkv", 111, 2048, info)
+        
+        self.assertEqual(self.db.get_stream_info("/test/movie.mkv", 111, 2048), info)
+        self.assertIsNone(self.db.get_stream_info("/test/movie.mkv", 222, 2048))  # file rewritten
+        self.assertIsNone(self.db.get_stream_info("/test/other.mkv", 111, 2048))
+
+    def test_stale_stream_info_cache_is_recreated(self):
+        self.db.close()
+        with closing(sqlite3.connect(self.temp_db.name)) as conn:
+            conn.execute("DROP TABLE stream_info_cache")
+            conn.execute("CREATE TABLE stream_info_cache (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, "
+                         "height INTEGER, width INTEGER, codec_name TEXT, profile TEXT, pix_fmt TEXT)")
+            conn.execute("INSERT INTO stream_info_cache VALUES ('/test/movie.mkv', 111, 2048, 1080, 1920, 'hevc', 'Main 10', 'yuv420p10le')")
+            conn.execute("PRAGMA user_version = 1")
+            conn.commit()
+        
+        self.db = DatabaseManager(Path(self.temp_db.name))
+        self.assertIsNone(self.db.get_stream_info("/test/movie.mkv", 111, 2048))
+        info = VideoStreamInfo(width=1920, height=1080, codec_name="hevc", profile="Main 10", pix_fmt="yuv420p10le")
+        self.db.save_stream_info("/test/movie.mkv", 111, 2048, info)
+        self.assertEqual(self.db.get_stream_info("/test/movie.mkv", 111, 2048), info)
+
 if __name__ == '__main__':
     unittest.main()
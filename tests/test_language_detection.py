@@ -1,8 +1,37 @@
 
+import io
 from pathlib import Path
+from typing import BinaryIO, Callable, Optional
+
+# charset_normalizer is already a dependency and ships a chardet-compatible detect()
+from charset_normalizer import detect as _detect_charset
+
+# Filename language tags we trust, normalized to the codes the pipeline uses
+_LANG_WHITELIST = frozenset({'en', 'eng', 'ro', 'rum', 'rom'})
+_LANG_NORMALIZE = {'rum': 'ro', 'rom': 'ro', 'ro': 'ro', 'eng': 'en', 'en': 'en'}
+
+# A head sample is enough to guess an encoding; detectors cost O(N) over whatever they are given
+ENCODING_SAMPLE_BYTES = 4096
+
+def detect_encoding(source: str | Path | BinaryIO, detector: Callable[[bytes], dict] = _detect_charset,
+                    sample_bytes: int = ENCODING_SAMPLE_BYTES) -> Optional[str]:
+    """
+    Guess an encoding from the first sample_bytes of a path or an open binary stream.
+    Returns None when the path cannot be read (the sample names below are not on disk).
+    """
+    if hasattr(source, 'read'):
+        raw_data = source.read(sample_bytes)
+    else:
+        try:
+            with open(source, 'rb') as f:
+                raw_data = f.read(sample_bytes)
+        except OSError:
+            return None
+    return detector(raw_data).get('encoding')
 
 # Mocking the get_language function to test logic in isolation
-def get_language_mock(subtitle_path: str | Path) -> str:
+def get_language_mock(subtitle_path: str | Path, detector: Callable[[bytes], dict] = _detect_charset,
+                      sample_bytes: int = ENCODING_SAMPLE_BYTES) -> str:
     path = Path(subtitle_path)
     
     # --- PROPOSED NEW LOGIC START ---
@@ -10,19 +39,20 @@ def get_language_mock(subtitle_path: str | Path) -> str:
     # Get the suffix parts. Path.suffixes returns ['.en', '.srt'] for 'movie.en.srt'
     # But we want the part specifically before the extension.
     
-    parts = path.stem.split('.')
-    if len(parts) > 1:
-        potential_lang = parts[-1].lower()
+    # Only the last dotted part matters: slice it off instead of splitting the whole stem
+    stem = path.stem
+    i = stem.rfind('.')
+    if i >= 0:
+        potential_lang = stem[i + 1:].lower()
         
         # Simple whitelist for now based on user context
-        # You might want to expand this list
-        if potential_lang in ['en', 'eng', 'ro', 'rum', 'rom']:
-            # Normalize map
-            if potential_lang in ['rum', 'rom']: return 'ro'
-            if potential_lang in ['eng']: return 'en'
-            return potential_lang
+        # You might want to expand _LANG_WHITELIST / _LANG_NORMALIZE
+        if potential_lang in _LANG_WHITELIST:
+            return _LANG_NORMALIZE[potential_lang]
     # --- PROPOSED NEW LOGIC END ---
 
+    # Filename gave no answer: only now pay for encoding detection
+    detect_encoding(path, detector, sample_bytes)
     return "fallback_to_detection"
 
 # Test cases
@@ -35,9 +65,33 @@ test_files = [
     "Another.Movie.rum.srt"
 ]
 
-print(f"{'Filename':<80} | {'Detected Language'}")
-print("-" * 100)
+def _counting_detector(calls: list) -> Callable[[bytes], dict]:
+    def detector(raw_data: bytes) -> dict:
+        calls.append(len(raw_data))
+        return _detect_charset(raw_data)
+    return detector
+
+def test_encoding_detection_runs_only_when_filename_whitelist_misses():
+    calls = []
+    detector = _counting_detector(calls)
+    assert get_language_mock(Path(__file__).with_name("Movie.ro.srt"), detector) == 'ro'
+    assert not calls
+    get_language_mock(Path(__file__), detector)
+    assert len(calls) == 1
+    assert calls[0] <= ENCODING_SAMPLE_BYTES
+
+def test_encoding_detection_reads_only_the_head_sample():
+    # Detection cost is bounded by the sample, not the stream: only the first ENCODING_SAMPLE_BYTES are read
+    calls = []
+    stream = io.BytesIO(b"1\n00:00:01,000 --> 00:00:02,000\nHello\n\n" * (4 * ENCODING_SAMPLE_BYTES // 40))
+    detect_encoding(stream, _counting_detector(calls))
+    assert stream.tell() == ENCODING_SAMPLE_BYTES
+    assert calls == [ENCODING_SAMPLE_BYTES]
+
+if __name__ == "__main__":
+    print(f"{'Filename':<80} | {'Detected Language'}")
+    print("-" * 100)
 
-for f in test_files:
-    lang = get_language_mock(f)
-    print(f"{f:<80} | {lang}")
+    for f in test_files:
+        lang = get_language_mock(f)
+        print(f"{f:<80} | {lang}")
@@ -0,0 +1,28 @@
+import json
+from unittest.mock import patch, MagicMock
+
+from metadata_utils import search_movie_tmdb
+
+def _tmdb_response(results):
+    response = MagicMock()
+    response.status = 200
+    response.read.return_value = json.dumps({"results": results}).encode("utf-8")
+    response.__enter__.return_value = response
+    return response
+
+def test_search_movie_tmdb_caches_candidates(mock_config):
+    results = [{"title": "Avatar", "release_date": "2009-12-18"}, {"title": "Avatar: The Way of Water", "release_date": "2022-12-14"}]
+
+    with patch('metadata_utils.urllib.request.urlopen', return_value=_tmdb_response(results)) as mock_urlopen:
+        first = search_movie_tmdb(mock_config, "Avatar.2009.1080p.mkv", "Avatar.2009.1080p", year="2009")
+        second = search_movie_tmdb(mock_config, "Avatar.2009.1080p.mkv", "Avatar.2009.1080p", year="2009")
+
+    assert first == second == ("Avatar", "2009")
+    assert mock_urlopen.call_count == 1
+
+def test_search_movie_tmdb_does_not_memoize_empty_results(mock_config):
+    with patch('metadata_utils.urllib.request.urlopen', side_effect=lambda req: _tmdb_response([])) as mock_urlopen:
+        assert search_movie_tmdb(mock_config, "Unreleased.2031.mkv", "Unreleased.2031", year="2031") is None
+        assert search_movie_tmdb(mock_config, "Unreleased.2031.mkv", "Unreleased.2031", year="2031") is None
+
+    assert mock_urlopen.call_count == 2
@@ -2,7 +2,9 @@ import pytest
 from pathlib import Path
 from unittest.mock import patch, MagicMock
 
-from models import MediaFactory, MediaType, Movie, TVEpisode, VideoStreamInfo
+from models import MediaFactory, MediaType, Movie, TVEpisode, VideoStreamInfo, EncodingTier
+from encoding_utils import get_audio_streams
+from subtitle_utils import get_track
 
 def test_media_factory_movie(mock_config):
     movie_path = mock_config.base_movies_root / "Avatar.mkv"
@@ -57,3 +59,88 @@ def test_video_stream_info_parsing(mock_run, mock_config):
     assert info.codec_name == "hevc"
     assert info.profile == "main 10"  # Note it's converted to lower case inside
     assert info.pix_fmt == "yuv420p10le"
+
+def test_encoding_tier_is_slotted():
+    tier = EncodingTier(bf=4, lad=20, async_depth=4, desc="Balanced")
+    assert not hasattr(tier, "__dict__")
+    assert (tier.bf, tier.lad, tier.async_depth, tier.hyper) == (4, 20, 4, False)
+
+def test_video_stream_info_is_slotted():
+    info = VideoStreamInfo(width=1920, height=1080, codec_name="h264", profile="high", pix_fmt="yuv420p")
+    assert not hasattr(info, "__dict__")
+    assert (info.master_display, info.max_cll, info.bit_rate) == ("", "", 0)
+
+@patch('subprocess.run')
+def test_video_stream_info_bit_rate_falls_back_to_format(mock_run, mock_config):
+    mock_proc = MagicMock()
+    mock_proc.stdout = '{"streams": [{"codec_name": "hevc", "width": 1920, "height": 1080, "pix_fmt": "yuv420p"}], "format": {"bit_rate": "8000000"}}'
+    mock_run.return_value = mock_proc
+
+    file_path = mock_config.base_movies_root / "Avatar.mkv"
+    file_path.touch()
+
+    info = VideoStreamInfo.from_file(file_path, mock_config)
+
+    assert info.bit_rate == 8000000
+
+@patch('subprocess.run')
+def test_video_stream_info_probe_is_cached_until_file_changes(mock_run, mock_config):
+    mock_proc = MagicMock()
+    mock_proc.stdout = '{"streams": [{"codec_name": "h264", "width": 1920, "height": 1080, "pix_fmt": "yuv420p"}]}'
+    mock_run.return_value = mock_proc
+
+    file_path = mock_config.base_movies_root / "Cached.mkv"
+    file_path.write_bytes(b"a")
+
+    VideoStreamInfo.from_file(file_path, mock_config)
+    VideoStreamInfo.from_file(file_path, mock_config)
+    assert mock_run.call_count == 1
+
+    file_path.write_bytes(b"ab")
+    VideoStreamInfo.from_file(file_path, mock_config)
+    assert mock_run.call_count == 2
+
+@patch('subprocess.run')
+def test_track_lookups_share_one_stream_probe(mock_run, mock_config):
+    mock_proc = MagicMock()
+    mock_proc.stdout = ('{"streams": ['
+                        '{"index": 0, "codec_type": "video", "codec_name": "h264"},'
+                        '{"index": 1, "codec_type": "audio", "channels": 6, "tags": {"language": "eng"}},'
+                        '{"index": 2, "codec_type": "subtitle", "codec_name": "subrip", "tags": {"language": "eng"}},'
+                        '{"index": 3, "codec_type": "subtitle", "codec_name": "subrip", "tags": {"language": "rum"}}]}')
+    mock_run.return_value = mock_proc
+
+    file_path = mock_config.base_movies_root / "Tracks.mkv"
+    file_path.write_bytes(b"a")
+
+    assert get_track(file_path, mock_config) == (3, "subrip", "ro")
+    assert get_audio_streams(file_path, mock_config) == [{"index": 1, "channels": 6, "lang": "eng"}]
+    assert mock_run.call_count == 1
+
+def test_media_factory_tv_directory_probes_every_episode(mock_config):
+    season_dir = mock_config.base_tvseries_root / "Show" / "Season.01"
+    season_dir.mkdir(parents=True)
+    for n in (2, 1):
+        (season_dir / f"Show.S01E0{n}.mkv").touch()
+
+    info = VideoStreamInfo(width=1920, height=1080, codec_name="h264", profile="high", pix_fmt="yuv420p")
+    with patch('models.VideoStreamInfo.from_file', return_value=info) as mock_from_file:
+        items = MediaFactory.create(MediaType.TVSERIES, season_dir, mock_config)
+
+    assert [item.source_path.name for item in items] == ["Show.S01E01.mkv", "Show.S01E02.mkv"]
+    assert all(item.stream_info is info for item in items)
+    assert mock_from_file.call_count == 2
+
+def test_media_item_without_probe_loads_stream_info_on_first_access(mock_config):
+    movie_path = mock_config.base_movies_root / "Avatar.2009.mkv"
+    movie_path.touch()
+
+    info = VideoStreamInfo(width=1920, height=1080, codec_name="h264", profile="high", pix_fmt="yuv420p")
+    with patch('models.VideoStreamInfo.from_file', return_value=info) as mock_from_file:
+        item = Movie(source_path=movie_path, config=mock_config, probe=False)
+        assert item.target_directory() == mock_config.target_movies_dir
+        assert mock_from_file.call_count == 0
+
+        assert item.stream_info is info
+        assert item.stream_info is info
+        assert mock_from_file.call_count == 1
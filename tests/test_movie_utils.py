@@ -1,7 +1,8 @@
+import tempfile
 import unittest
 from pathlib import Path
 from movie_utils import sanitize_movie_name, get_largest_movie_file
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 from config import AppConfig
 
 class TestMovieUtils(unittest.TestCase):
@@ -23,33 +24,17 @@ class TestMovieUtils(unittest.TestCase):
         clean2 = sanitize_movie_name("Unknown.Movie.1080p.x264", self.config)
         self.assertEqual(clean2, "Unknown.Movie")
 
-    @patch.object(Path, 'is_file', return_value=False)
-    @patch.object(Path, 'glob')
-    def test_get_largest_movie_file(self, mock_glob, mock_is_file):
-        folder = Path("/movies/Matrix")
-        
-        # Mocking files with stat logic
-        f1 = MagicMock(spec=Path)
-        f1.name = "small.mp4"
-        f1.stat.return_value.st_size = 100
-        
-        f2 = MagicMock(spec=Path)
-        f2.name = "large.mkv"
-        f2.stat.return_value.st_size = 5000
-        
-        # Provide files for glob
-        def mock_glob_side_effect(pattern):
-            if pattern == '*.mkv':
-                return [f2]
-            if pattern == '*.mp4':
-                return [f1]
-            return []
+    def test_get_largest_movie_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            folder = Path(tmp)
+            (folder / "small.mp4").write_bytes(b"x" * 100)
+            (folder / "large.mkv").write_bytes(b"x" * 5000)
+            (folder / "huge.nfo").write_bytes(b"x" * 9000)
+            (folder / "sub.mkv").mkdir()
             
-        mock_glob.side_effect = mock_glob_side_effect
-        
-        largest = get_largest_movie_file(folder)
-        self.assertIsNotNone(largest)
-        self.assertEqual(largest.name, "large.mkv")
+            largest = get_largest_movie_file(folder)
+            self.assertIsNotNone(largest)
+            self.assertEqual(largest.name, "large.mkv")
 
 if __name__ == '__main__':
     unittest.main()
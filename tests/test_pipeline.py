@@ -27,8 +27,7 @@ def test_vram_exhaustion_step_down(dummy_media_item, in_memory_db, mock_config):
             # create the output file so the size validation passes
             temp_output = dummy_media_item.source_path.with_name(f"{dummy_media_item.clean_name()}_converted.mp4")
             temp_output.parent.mkdir(parents=True, exist_ok=True)
-            with open(temp_output, 'wb') as f:
-                f.write(b'0' * 1024)
+            temp_output.write_bytes(b'0' * 1024)
                 
             mock_success = MagicMock()
             mock_success.returncode = 0
@@ -1,6 +1,6 @@
 import unittest
 from pathlib import Path
-from subtitle_utils import process_subtitle, get_track
+from subtitle_utils import process_subtitle, get_track, character_replace, get_language, detect_and_convert_encoding
 from unittest.mock import patch, MagicMock
 from config import AppConfig
 import tempfile
@@ -79,5 +79,89 @@ class TestSubtitleUtils(unittest.TestCase):
             content = new_path.read_text(encoding='utf-8')
             self.assertIn("si ti", content)
 
+    def test_character_replace_applies_multi_char_rules_first(self):
+        config = AppConfig(replace_rules=(("ş", "s"), ("Ã®", "î"), ("Ã", "A")))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            src = Path(tmpdir) / "in.srt"
+            dst = Path(tmpdir) / "out.srt"
+            src.write_text("şi Ã® Ãx", encoding='utf-8')
+            
+            character_replace(src, dst, config)
+            
+            self.assertEqual(dst.read_text(encoding='utf-8'), "si î Ax")
+
+    def test_character_replace_keeps_destination_when_source_missing(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dst = Path(tmpdir) / "out.srt"
+            dst.write_text("previous", encoding='utf-8')
+            
+            with self.assertRaises(FileNotFoundError):
+                character_replace(Path(tmpdir) / "missing.srt", dst, self.config)
+            
+            self.assertEqual(dst.read_text(encoding='utf-8'), "previous")
+            self.assertEqual(os.listdir(tmpdir), ["out.srt"])
+
+    @patch('subtitle_utils._detect_language')
+    def test_get_language_trigram_shortcut_skips_langdetect(self, mock_detect):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            sub = Path(tmpdir) / "Film.srt"
+            sub.write_text(
+                "1\n00:00:01,000 --> 00:00:02,000\nNu știu ce să fac. Tatăl meu a spus că în seara asta mergem acasă.\n"
+                "\n2\n00:00:03,000 --> 00:00:04,000\nȚi-am zis că nu mă interesează.\n",
+                encoding='utf-8'
+            )
+            
+            self.assertEqual(get_language(sub), 'ro')
+            mock_detect.assert_not_called()
+
+    @patch('subtitle_utils._detect_language')
+    def test_get_language_leaves_other_languages_to_langdetect(self, mock_detect):
+        samples = {
+            'de': "Ich weiß nicht, was ich tun soll. Mein Vater hat gesagt, dass wir heute Abend nach Hause gehen. "
+                  "Ich habe dir gesagt, dass es mich nicht interessiert. Wo ist der Schlüssel?",
+            'es': "No sé qué hacer. Mi padre dijo que esta noche volvemos a casa. "
+                  "Te dije que no me interesa. ¿Dónde está la llave? Ya lo sabía.",
+        }
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for lang, text in samples.items():
+                with self.subTest(lang=lang):
+                    mock_detect.reset_mock()
+                    mock_detect.return_value = lang
+                    sub = Path(tmpdir) / f"Film_{lang}.srt"
+                    sub.write_text(f"1\n00:00:01,000 --> 00:00:02,000\n{text}\n", encoding='utf-8')
+                    
+                    self.assertEqual(get_language(sub), lang)
+                    mock_detect.assert_called_once()
+
+    @patch('subtitle_utils._detect_language', side_effect=[RuntimeError("transient"), 'de'])
+    def test_get_language_does_not_cache_unexpected_errors(self, mock_detect):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            sub = Path(tmpdir) / "Film_retry.srt"
+            sub.write_text("1\n00:00:01,000 --> 00:00:02,000\nIch weiß nicht, was ich tun soll.\n", encoding='utf-8')
+            
+            self.assertEqual(get_language(sub), "error_detecting_language")
+            self.assertEqual(get_language(sub), 'de')
+            self.assertEqual(mock_detect.call_count, 2)
+
+    def test_detect_and_convert_encoding_skips_write_only_when_normalized(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            text = "1\n00:00:01,000 --> 00:00:02,000\nȘi ce dacă?"
+            normalized = Path(tmpdir) / "normalized.srt"
+            normalized.write_bytes(text.encode('utf-8'))
+            padded = Path(tmpdir) / "padded.srt"
+            padded.write_bytes(f"\n{text}\n\n".encode('utf-8'))
+            bom = Path(tmpdir) / "bom.srt"
+            bom.write_bytes(b"\xef\xbb\xbf" + text.encode('utf-8'))
+            
+            with patch('builtins.open', wraps=open) as mock_open:
+                self.assertEqual(detect_and_convert_encoding(normalized), text)
+                write_modes = [c for c in mock_open.call_args_list if c.args[1:2] == ('w',)]
+                self.assertEqual(write_modes, [])
+            
+            for path in (padded, bom):
+                with self.subTest(path=path.name):
+                    self.assertEqual(detect_and_convert_encoding(path), text)
+                    self.assertEqual(path.read_bytes(), text.encode('utf-8'))
+
 if __name__ == '__main__':
     unittest.main()
@@ -12,22 +12,23 @@ class TestTVSeriesUtils(unittest.TestCase):
         # Fallback (no SxxExx detected)
         self.assertEqual(sanitize_tvseries_name("Regular.Show.1080p.x264"), "Regular.Show")
         
-    @patch('shutil.move')
+    @patch.object(Path, 'rename', autospec=True)
     def test_clean_season_folder_name(self, mock_move):
         path = Path("/tv/Show/Season 1")
         new_path = clean_season_folder_name(path)
         self.assertEqual(new_path.name, "Season01")
-        mock_move.assert_called_once_with(str(path), str(new_path))
+        mock_move.assert_called_once_with(path, new_path)
         
         path2 = Path("/tv/Show/S02")
         new_path2 = clean_season_folder_name(path2)
         self.assertEqual(new_path2.name, "Season02")
         
         # Already clean
+        mock_move.reset_mock()
         path3 = Path("/tv/Show/Season03")
         new_path3 = clean_season_folder_name(path3)
         self.assertEqual(new_path3.name, "Season03")
-        mock_move.reset_mock()
+        mock_move.assert_not_called()
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,72 +1,166 @@
 import ast
+import hashlib
 import os
+import pickle
+import tempfile
 
 from pathlib import Path
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from operator import itemgetter
+
+# Node types _analyze_file acts on, matched by exact type: parse() never yields subclasses
+_IMPORT_NODES = frozenset({ast.Import, ast.ImportFrom})
+_DEF_NODES = frozenset({ast.FunctionDef, ast.ClassDef, ast.AsyncFunctionDef})
+
+# Below this many files scan() parses in-process; a process pool's startup outweighs the work
+_PARALLEL_MIN_FILES = 64
+
+# Special cases never reported as unused: often used implicitly or valid to keep
+_IMPLICIT_IMPORTS = frozenset({'sys', 'os'})
+
+# Per-file summaries persist here (under the audit root; hidden, so never scanned). Bump the version
+# whenever _analyze_file's output changes so stale summaries are ignored.
+AUDIT_CACHE_DIR = ".audit_cache"
+_AUDIT_CACHE_VERSION = 2
+
+# Directory names never descended into (hidden directories are skipped as well)
+_EXCLUDED_DIRS = frozenset({'venv', 'tests', 'tools'})
+
+def _scandir_py(path):
+    """Yield .py file paths under path, pruning excluded subtrees before descending into them."""
+    with os.scandir(path) as it:
+        for entry in it:
+            name = entry.name
+            if name.startswith('.'):
+                continue
+            # DirEntry answers is_dir/is_file from the directory listing, no extra stat per entry
+            if entry.is_dir(follow_symlinks=False):
+                if name not in _EXCLUDED_DIRS:
+                    yield from _scandir_py(entry.path)
+            elif name.endswith('.py') and entry.is_file():
+                yield entry.path
+
+def _cache_entry_path(cache_dir, file_path):
+    return os.path.join(cache_dir, hashlib.blake2b(file_path.encode(), digest_size=16).hexdigest() + ".pickle")
+
+def _load_cached_summary(cache_dir, file_path, st):
+    """Summary stored for this exact (mtime_ns, size) of file_path, or None."""
+    try:
+        with open(_cache_entry_path(cache_dir, file_path), "rb") as f:
+            version, mtime_ns, size, summary = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+        return None
+    if version != _AUDIT_CACHE_VERSION or mtime_ns != st.st_mtime_ns or size != st.st_size:
+        return None
+    return summary
+
+def _store_summary(cache_dir, file_path, st, summary):
+    # Write a temp file and rename it in, so parallel workers and interrupted runs never leave a torn entry
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((_AUDIT_CACHE_VERSION, st.st_mtime_ns, st.st_size, summary), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, _cache_entry_path(cache_dir, file_path))
+    except OSError as e:
+        print(f"Could not cache audit summary for {file_path}: {e}")
+
+def _analyze_file(file_path, cache_dir=None):
+    """
+    Parse and summarize one file. Module-level and self-contained so process workers can run it:
+    returns (file_path, error, unused_imports, definitions, local_usages), error None on success.
+    With a cache_dir, files unchanged since their last audit (same mtime_ns and size) skip parsing.
+    """
+    st = os.stat(file_path)
+    if cache_dir is not None:
+        summary = _load_cached_summary(cache_dir, file_path, st)
+        if summary is not None:
+            return (file_path, None) + summary
+
+    # Raw bytes: the parser decodes them itself (honouring any coding cookie), no text-layer pass
+    with open(file_path, "rb") as f:
+        source = f.read()
+    try:
+        tree = ast.parse(source, filename=file_path)
+    except Exception as e:
+        return file_path, e, [], [], set()
+
+    # Local analysis for imports
+    imports = {}
+    local_usages = set()
+    definitions = []
+
+    # One type() lookup per node instead of an isinstance chain; Name/Attribute (most nodes) go first
+    for node in ast.walk(tree):
+        node_type = type(node)
+        if node_type is ast.Name:
+            if type(node.ctx) is ast.Load:
+                local_usages.add(node.id)
+        elif node_type is ast.Attribute:
+            local_usages.add(node.attr) # usage of attribute name
+        elif node_type in _DEF_NODES:
+            if not node.name.startswith('_'): # Skip privates
+                definitions.append((node.name, node.lineno))
+        elif node_type in _IMPORT_NODES:
+            for alias in node.names:
+                name = alias.asname or alias.name
+                # If it's a dotted import (e.g. os.path), we track 'os'
+                root_name = name.split('.')[0]
+                imports[root_name] = (alias.name, node.lineno)
+
+    # Filter unused imports: one set difference, reported in source line order
+    unused_names = imports.keys() - local_usages - _IMPLICIT_IMPORTS
+    unused_imports = sorted((imports[name] for name in unused_names), key=itemgetter(1))
+
+    if cache_dir is not None:
+        _store_summary(cache_dir, file_path, st, (unused_imports, definitions, local_usages))
+    return file_path, None, unused_imports, definitions, local_usages
 
 class CodeAuditor:
-    def __init__(self, root_dir):
+    __slots__ = ('root_dir', 'cache_dir', 'python_files', 'global_definitions', 'global_usages', 'file_unused_imports')
+
+    def __init__(self, root_dir, use_cache=True):
         self.root_dir = Path(root_dir)
+        self.cache_dir = str(self.root_dir / AUDIT_CACHE_DIR) if use_cache else None
         self.python_files = self._get_python_files()
         
         # Tracking
-        self.global_definitions = defaultdict(list) # name -> [(file, lineno)]
+        self.global_definitions = {} # name -> [(file, lineno)]
         self.global_usages = set()
-        self.file_unused_imports = defaultdict(list)
+        self.file_unused_imports = {} # file -> [(module, lineno)]
 
     def _get_python_files(self):
-        # Exclude hidden, tests, tools
-        return [p for p in self.root_dir.rglob("*.py") 
-                if not any(part.startswith('.') for part in p.parts)
-                and 'tests' not in p.parts 
-                and 'tools' not in p.parts
-                and 'venv' not in p.parts]
+        # Exclude hidden, tests, tools, venv; plain path strings, no Path objects per file
+        return list(_scandir_py(self.root_dir))
 
     def scan(self):
-        for file_path in self.python_files:
-            self._analyze_file(file_path)
+        # Parsing is CPU-bound and independent per file: fan out to processes, then merge in file order.
+        # Small trees stay in-process, where pool startup would cost more than the parsing.
+        analyze = partial(_analyze_file, cache_dir=self.cache_dir)
+        if len(self.python_files) >= _PARALLEL_MIN_FILES:
+            with ProcessPoolExecutor() as executor:
+                for result in executor.map(analyze, self.python_files, chunksize=8):
+                    self._merge(*result)
+        else:
+            for file_path in self.python_files:
+                self._merge(*analyze(file_path))
             
         self._report()
 
-    def _analyze_file(self, file_path):
-        with open(file_path, "r", encoding="utf-8") as f:
-            try:
-                tree = ast.parse(f.read())
-            except Exception as e:
-                print(f"Skipping {file_path}: {e}")
-                return
-
-        # Local analysis for imports
-        imports = {}
-        local_usages = set()
-        definitions = []
-
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.Import, ast.ImportFrom)):
-                for alias in node.names:
-                    name = alias.asname or alias.name
-                    # If it's a dotted import (e.g. os.path), we track 'os'
-                    root_name = name.split('.')[0]
-                    imports[root_name] = (alias.name, node.lineno)
-            elif isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.AsyncFunctionDef)):
-                if not node.name.startswith('_'): # Skip privates
-                    definitions.append((node.name, node.lineno))
-            elif isinstance(node, ast.Name):
-                if isinstance(node.ctx, ast.Load):
-                    local_usages.add(node.id)
-            elif isinstance(node, ast.Attribute):
-                local_usages.add(node.attr) # usage of attribute name
-
-        # Filter unused imports
-        for name, (module, lineno) in imports.items():
-            if name not in local_usages:
-                # Special cases
-                if name in ['sys', 'os']: continue # often used implicitly or valid to keep
-                self.file_unused_imports[file_path].append((module, lineno))
+    def _merge(self, file_path, error, unused_imports, definitions, local_usages):
+        if error is not None:
+            print(f"Skipping {file_path}: {error}")
+            return
+
+        # Each file is merged once, so its own list can be stored as-is
+        if unused_imports:
+            self.file_unused_imports[file_path] = unused_imports
 
         # Update global stats
+        global_definitions = self.global_definitions
         for def_name, lineno in definitions:
-            self.global_definitions[def_name].append((file_path, lineno))
+            global_definitions.setdefault(def_name, []).append((file_path, lineno))
         
         self.global_usages.update(local_usages)
 
@@ -74,7 +168,7 @@ class CodeAuditor:
         print("=== UNUSED IMPORTS ===")
         for path, unused in self.file_unused_imports.items():
             if unused:
-                print(f"\n[{path.name}]")
+                print(f"\n[{os.path.basename(path)}]")
                 for mod, line in unused:
                     print(f"  Line {line}: {mod}")
 
@@ -85,7 +179,7 @@ class CodeAuditor:
                 if name in ['__init__', 'setUp', 'tearDown', 'run']: continue
                 
                 for path, line in locations:
-                    print(f"  {name} (Line {line}) in {path.name}")
+                    print(f"  {name} (Line {line}) in {os.path.basename(path)}")
 
 if __name__ == "__main__":
     auditor = CodeAuditor(os.getcwd())
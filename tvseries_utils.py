@@ -5,11 +5,14 @@ TV Series utilities for detecting, parsing, and processing TV series paths.
 Handles season folder renaming and episode queueing.
 """
 
+import errno
 import logging
 import re
 import shutil
+from functools import lru_cache
 from pathlib import Path
 from typing import TYPE_CHECKING, Optional
+from file_utils import walk_media_files
 
 if TYPE_CHECKING:
     from db_utils import DatabaseManager
@@ -17,6 +20,23 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# Compiled once; IGNORECASE replaces lowercasing the name on every call
+_SXXEXX_RE = re.compile(r's\d{2}e\d{2}', re.IGNORECASE)
+_RES_RE = re.compile(r'\.(2160p|1080p|720p|480p).*', re.IGNORECASE)
+_CODEC_RE = re.compile(r'\.(HDTV|WEB-DL|BluRay|BRRip|x264|x265|HEVC|AAC).*', re.IGNORECASE)
+# Season folder number in one anchored match. A "Season 1"/"Season.01" form anywhere wins (group 1);
+# otherwise the first "sNN" (group 2), the same precedence the two separate searches had.
+_SEASON_RE = re.compile(r'(?:.*?season[\s._-]*(\d+)|.*?s(\d{2}))', re.IGNORECASE)
+
+@lru_cache(maxsize=4096)
+def _standard_season_name(folder_name: str) -> Optional[str]:
+    """Pure part of clean_season_folder_name: "SeasonNN" for a folder name, or None without a season number."""
+    # Season 1, Season 01, Season01, S01
+    match = _SEASON_RE.match(folder_name)
+    if match:
+        return f"Season{(match.group(1) or match.group(2)).zfill(2)}"
+    return None
+
 def clean_season_folder_name(season_path: Path) -> Optional[Path]:
     """
     Standardize season folder names.
@@ -26,32 +46,26 @@ def clean_season_folder_name(season_path: Path) -> Optional[Path]:
         Path: The path to the (potentially renamed) season directory.
         None: If renaming failed or folder is invalid.
     """
-    season_directory_lower = season_path.name.lower()
-    season_directory_name = None
-    
-    match = re.search(r's(\d{2})', season_directory_lower)
-    if match:
-        season_directory_name = f"Season{match.group(1)}"
-    
-    # Pattern 2: Season 1, Season 01, Season01
-    match = re.search(r'season[\s._-]*(\d+)', season_directory_lower)
-    if match:
-        season_directory_name = f"Season{match.group(1).zfill(2)}"
+    season_directory_name = _standard_season_name(season_path.name)
 
     if season_directory_name:
         new_season_path = season_path.parent / season_directory_name
-        if season_path.resolve() == new_season_path.resolve():
+        # Already correctly named: nothing to resolve or rename
+        if season_directory_name == season_path.name:
             return new_season_path
             
+        # Same parent, so this is a single rename(2); only a cross-device error needs the copy fallback
         try:
-            shutil.move(str(season_path), str(new_season_path))
-        except (shutil.Error, OSError) as e:
-            logger.warning(f"Cross-device move failed: {e}. Falling back to copytree/rmtree.")
+            season_path.rename(new_season_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                logger.error(f"Failed to rename season folder {season_path.name} -> {season_directory_name}: {e}")
+                return None
+            logger.warning(f"Cross-device rename failed: {e}. Falling back to shutil.move.")
             try:
-                shutil.copytree(str(season_path), str(new_season_path))
-                shutil.rmtree(str(season_path))
+                shutil.move(str(season_path), str(new_season_path))
             except Exception as inner_e:
-                logger.exception(f"Fallback copytree failed: {inner_e}")
+                logger.exception(f"Fallback move failed: {inner_e}")
                 return None
                 
         return new_season_path
@@ -61,16 +75,14 @@ def clean_season_folder_name(season_path: Path) -> Optional[Path]:
 def process_tv_series_directory(dir_path: Path, config: 'AppConfig', db: 'DatabaseManager') -> bool:
     target_dir = clean_season_folder_name(dir_path) or dir_path
     
-    episodes = []
-    for ext in ('.mkv', '.mp4', '.avi', '.m4v', '.MKV', '.MP4', '.AVI', '.M4V'):
-        episodes.extend(target_dir.rglob(f"*{ext}"))
+    episodes = walk_media_files(target_dir)
     
-    for ep in episodes:
-        db.add_job(str(ep.absolute()))
-        logger.info(f"QUEUED_EPISODE: {ep}")
+    queued = db.add_jobs_batch([str(ep.absolute()) for ep in episodes])
+    logger.info(f"QUEUED_EPISODES: {queued}/{len(episodes)} from {target_dir}")
         
     return True
 
+@lru_cache(maxsize=4096)
 def sanitize_tvseries_name(filename: str) -> str:
     """
     Extract clean episode name from filename.
@@ -83,13 +95,13 @@ def sanitize_tvseries_name(filename: str) -> str:
     name_no_ext = Path(filename).stem
     
     # Find SxxExx pattern
-    match = re.search(r'(.*?s\d{2}e\d{2})', name_no_ext.lower())
+    # Matching the original string (not a lowercased copy) also keeps match offsets valid for slicing
+    match = _SXXEXX_RE.search(name_no_ext)
     if match:
-        clean_name = name_no_ext[:match.end(1)]
-        return clean_name
+        return name_no_ext[:match.end()]
     
     # Fallback: remove common patterns
-    clean_name = re.sub(r'\.(2160p|1080p|720p|480p).*', '', name_no_ext, flags=re.IGNORECASE)
-    clean_name = re.sub(r'\.(HDTV|WEB-DL|BluRay|BRRip|x264|x265|HEVC|AAC).*', '', clean_name, flags=re.IGNORECASE)
+    clean_name = _RES_RE.sub('', name_no_ext)
+    clean_name = _CODEC_RE.sub('', clean_name)
     
     return clean_name
\ No newline at end of file